@@ -1,5 +1,8 @@
 from django.contrib import admin
-from django.utils.html import format_html
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.admin import UserAdmin
 from accounts.models import (
@@ -12,7 +15,9 @@ from accounts.models import (
     Feedback,
     ChatMessage,
     PremiumUser,
+    EmailOutbox,
 )
+from accounts.similarity import find_similar
 
 # =====================
 # USER ACCOUNT ADMIN
@@ -97,7 +102,7 @@ class UserProfileAdmin(admin.ModelAdmin):
         'occupation',
     )
     ordering = ('-created_at',)
-    readonly_fields = ('uid', 'user_identity', 'created_at', 'updated_at')
+    readonly_fields = ('uid', 'user_identity', 'created_at', 'updated_at', 'similar_photos')
     raw_id_fields = ('user',)
     inlines = [UploadImageInline]
 
@@ -108,6 +113,38 @@ class UserProfileAdmin(admin.ModelAdmin):
         return "—"
     view_image.short_description = 'Profile Image'
 
+    def similar_photos(self, obj):
+        """Other profiles whose profile or gallery photos are near-duplicates of this one's."""
+        if not obj.pk:
+            return "—"
+        gallery = list(obj.gallery_image.values_list('pk', 'image_dhash'))
+        hashes = [obj.image_dhash] + [value for _, value in gallery]
+        if not any(value is not None for value in hashes):
+            return "No photo hashes yet"
+        own = [('profile', obj.pk)] + [('gallery', pk) for pk, _ in gallery]
+        matches = find_similar(hashes, exclude=own)
+        gallery_owners = dict(
+            UploadImage.objects.filter(pk__in=[m.pk for m in matches if m.source == 'gallery'])
+            .values_list('pk', 'galary_id')
+        )
+        closest = {}
+        for match in matches:
+            profile_pk = match.pk if match.source == 'profile' else gallery_owners.get(match.pk)
+            if profile_pk and profile_pk != obj.pk and profile_pk not in closest:
+                closest[profile_pk] = match
+        if not closest:
+            return "No similar photos found"
+        profiles = UserProfile.objects.select_related('user').in_bulk(list(closest))
+        return format_html_join(
+            mark_safe('<br>'), '<a href="{}">{}</a> — {} photo, {} bits apart',
+            (
+                (reverse('admin:accounts_userprofile_change', args=[pk]), profiles[pk].user,
+                 match.source, match.distance)
+                for pk, match in closest.items() if pk in profiles
+            ),
+        )
+    similar_photos.short_description = 'Similar photos on other profiles'
+
     def save_model(self, request, obj, form, change):
         """Ensure user_identity is generated automatically."""
         if not obj.user_identity:
@@ -183,6 +220,20 @@ class PremiumUserAdmin(admin.ModelAdmin):
 
 
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('to', 'subject')
+    ordering = ('-created_at',)
+    readonly_fields = ('uid', 'created_at', 'sent_at', 'last_error')
+    actions = ['requeue']
+
+    @admin.action(description="Requeue selected emails")
+    def requeue(self, request, queryset):
+        queryset.update(status='pending', attempts=0, next_attempt_at=now())
+
+
 # =====================
 # ADMIN REGISTRATION
 # =====================
@@ -7,6 +7,10 @@ from .views import (
     logout_view,
     profiles_list,
     send_interest,
+    send_interests_bulk,
+    matches_view,
+    shortlist_view,
+    toggle_shortlist,
     interest_list,
     accept_interest,
     reject_interest,
@@ -15,6 +19,9 @@ from .views import (
     feedback_view,
     user_profile_detail,
     chat_view,
+    chat_history,
+    chat_mark_read,
+    chat_events,
     chat_home,
     premium_form_view,
     help_view,
@@ -32,6 +39,10 @@ urlpatterns = [
     path('logout/', logout_view, name='logout'),
     path('home/', profiles_list, name='profiles_list'),
     path('profiles/<int:profile_id>/interest/', send_interest, name='send_interest'),
+    path('interests/bulk/', send_interests_bulk, name='send_interests_bulk'),
+    path('matches/', matches_view, name='matches'),
+    path('shortlist/', shortlist_view, name='shortlist'),
+    path('profiles/<int:profile_id>/shortlist/', toggle_shortlist, name='toggle_shortlist'),
     path('interests/', interest_list, name='interest_list'),
     path('interests/<int:interest_id>/accept/', accept_interest, name='accept_interest'),
     path('interests/<int:interest_id>/reject/', reject_interest, name='reject_interest'),
@@ -43,6 +54,9 @@ urlpatterns = [
     path('about/', about_view, name='about'),
     path('profiles/<uuid:uid>/user/', user_profile_detail, name='user_profile_detail'),
     path('chat/email/<str:receiver_email>/fd277272-9457-48a3-9b23-85464e28d9e9/', chat_view, name='chat_view'),
+    path('chat/history/<str:receiver_email>/', chat_history, name='chat_history'),
+    path('chat/read/<str:receiver_email>/', chat_mark_read, name='chat_mark_read'),
+    path('chat/events/', chat_events, name='chat_events'),
     path('chat/', chat_home, name='chat_home'),
     path('premium/', premium_form_view, name='premium_form_view'),
 
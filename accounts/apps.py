@@ -5,4 +5,4 @@ class AccountConfig(AppConfig):
     name = 'accounts'
 
     def ready(self):
-        pass
\ No newline at end of file
+        from . import signals  # noqa: F401
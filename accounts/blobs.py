@@ -0,0 +1,191 @@
+"""
+Content-addressed storage for processed images.
+
+Every compressed photo or receipt is stored once as blobs/ab/cd/<digest>.jpg
+and shared by all rows that uploaded the same content. Uploads are recognised
+by a BLAKE2 digest of their raw bytes (MediaSource), so a repeat upload is
+resolved with one indexed lookup: no Pillow work and no storage write.
+
+References are counted on MediaBlob. ``acquire`` must succeed before a field
+points at a blob and ``release`` is called when the field stops pointing at
+it. Both run in the caller's transaction, so a failed save rolls them back;
+files are only deleted once the releasing transaction commits. The last
+release then deletes the blob row, its file and display variants while
+holding the row lock, and ``store`` takes the same lock before checking that
+the file exists: a store either finds the file still there and keeps it (the
+row is then no longer unreferenced garbage) or waits, finds the row gone and
+writes the file again under a new row. Acquiring a deleted blob fails, so a
+concurrent upload never ends up pointing at a removed file.
+"""
+import hashlib
+import os
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .images import delete_variants, dhash_bytes, render_stored_variants, save_variants
+from .models import MediaBlob, MediaSource
+from .similarity import to_signed
+
+
+BLOB_DIR = 'blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+def _hasher():
+    return hashlib.blake2b(digest_size=32)
+
+
+def settings_key(instance):
+    """Processing settings that shape the output; part of the source digest."""
+    return f'{instance.MAX_IMAGE_SIZE_KB}:{instance.STANDARD_WIDTH}x{instance.STANDARD_HEIGHT}'
+
+
+def source_digest(upload, key):
+    """BLAKE2b of the raw upload bytes, salted with the processing settings ``key``."""
+    hasher = _hasher()
+    hasher.update(key.encode())
+    upload.seek(0)
+    for chunk in iter(lambda: upload.read(CHUNK_SIZE), b''):
+        hasher.update(chunk)
+    upload.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_name(digest):
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:4], f'{digest}.jpg')
+
+
+def find_source(digest):
+    """The blob previously produced from an upload with this digest, or None."""
+    return MediaBlob.objects.filter(sources__digest=digest).first()
+
+
+def store(data, source=None, variants=None):
+    """
+    Store processed JPEG bytes, or reuse the blob with identical content, and
+    remember that ``source`` produces it. ``variants`` are pre-rendered display
+    variants; pass True to render them here, None to skip (receipts).
+    Returns the MediaBlob; the caller still has to ``acquire`` it.
+    """
+    hasher = _hasher()
+    hasher.update(data)
+    digest = hasher.hexdigest()
+    while True:
+        with transaction.atomic():
+            # Waits for a running _collect of this blob; afterwards the row is gone and is recreated
+            blob = MediaBlob.objects.select_for_update().filter(digest=digest).first()
+            if blob is None:
+                # Photos (those with display variants) also get a perceptual hash for similarity.py
+                photo_hash = to_signed(dhash_bytes(data)) if variants else None
+                try:
+                    with transaction.atomic():
+                        blob = MediaBlob.objects.create(
+                            digest=digest, name=blob_name(digest), size=len(data), dhash=photo_hash
+                        )
+                except IntegrityError:
+                    continue  # another request stored the same content first; lock its row
+            if not default_storage.exists(blob.name):
+                default_storage.save(blob.name, ContentFile(data))
+                if variants is True:
+                    render_stored_variants(default_storage, blob.name)
+                elif variants:
+                    save_variants(default_storage, blob.name, variants)
+            if source:
+                MediaSource.objects.get_or_create(digest=source, defaults={'blob': blob})
+            return blob
+
+
+def acquire(blob, count=1):
+    """Take ``count`` references on ``blob``. False if it was deleted meanwhile."""
+    return MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + count) == 1
+
+
+def release(field_file):
+    """
+    Drop a field's reference to its file. Blob files are deleted with their last
+    reference; files outside the blob store belong to one row and go right away.
+    Either way the file is only deleted once the current transaction commits.
+    """
+    if field_file:
+        release_name(field_file.name, field_file.storage)
+
+
+def release_name(name, storage=default_storage):
+    if not name.startswith(BLOB_DIR + '/'):
+        transaction.on_commit(partial(_delete_file, storage, name))
+        return
+    updated = MediaBlob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+    if updated and MediaBlob.objects.filter(name=name, refcount=0).exists():
+        transaction.on_commit(partial(_collect, storage, name))
+
+
+def _delete_file(storage, name):
+    storage.delete(name)
+    delete_variants(storage, name)
+
+
+def _collect(storage, name):
+    """Delete an unreferenced blob with its files, unless it was acquired again meanwhile."""
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(name=name, refcount=0).first()
+        if blob is None:
+            return
+        # Files go while the row is locked, so a concurrent store() waits and writes them again
+        _delete_file(storage, name)
+        blob.delete()
+
+
+def adopt_processed(instance, stored, field_name):
+    """
+    Take the file, state and hash of ``field_name`` from ``stored`` (the row as
+    in the DB) when ``instance`` was loaded while that upload was 'processing'.
+    The worker may have swapped the blob in, or given up, since; saving the
+    stale raw name would write a deleted file back and release the new blob.
+    """
+    state_field = f'{field_name}_state'
+    field_file = getattr(instance, field_name)
+    if getattr(instance, state_field) != 'processing' or not field_file or not field_file._committed:
+        return  # not waiting on the worker, cleared, or replaced by a fresh upload
+    setattr(instance, field_name, getattr(stored, field_name).name)
+    setattr(instance, state_field, getattr(stored, state_field))
+    hash_field = f'{field_name}_dhash'
+    if hasattr(instance, hash_field):
+        setattr(instance, hash_field, getattr(stored, hash_field))
+
+
+def intern_upload(instance, field_name, compressor, variants=True):
+    """
+    Point a freshly uploaded file field at its content-addressed blob.
+
+    A repeat upload just takes a reference on the existing blob. Otherwise the
+    upload is compressed inline when IMAGE_PROCESSING_SYNC is set, or left raw in
+    the 'processing' state for run_image_processing. Returns True if the field
+    now points at a blob.
+    """
+    upload = getattr(instance, field_name)
+    state_field = f'{field_name}_state'
+    source = source_digest(upload, settings_key(instance))
+    blob = find_source(source)
+    hash_field = f'{field_name}_dhash' if hasattr(instance, f'{field_name}_dhash') else None
+    if blob is None or not acquire(blob):
+        if not settings.IMAGE_PROCESSING_SYNC:
+            # Store the raw upload; run_image_processing compresses it and swaps it in
+            setattr(instance, state_field, 'processing')
+            if hash_field:
+                setattr(instance, hash_field, None)
+            return False
+        data = compressor(upload).read()
+        blob = store(data, source, variants or None)
+        while not acquire(blob):
+            # Its last reference was released between store() and acquire(); store it again
+            blob = store(data, source, variants or None)
+    setattr(instance, field_name, blob.name)
+    setattr(instance, state_field, 'ready')
+    if hash_field:
+        setattr(instance, hash_field, blob.dhash)
+    return True
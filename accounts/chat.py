@@ -0,0 +1,153 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, OuterRef, PositiveIntegerField, Q, Subquery, When
+from django.db.models.functions import Coalesce
+
+from .models import ChatMessage, Conversation, ConversationMember
+from .unread import clear_unread, forget_unread, increment_unread
+
+
+PREVIEW_LENGTH = 255
+
+
+def _pair(user_a_id, user_b_id):
+    return (user_a_id, user_b_id) if user_a_id < user_b_id else (user_b_id, user_a_id)
+
+
+def get_conversation(user_a_id, user_b_id):
+    low, high = _pair(user_a_id, user_b_id)
+    return Conversation.objects.filter(user_low_id=low, user_high_id=high).first()
+
+
+def get_or_create_conversation(user_a_id, user_b_id):
+    low, high = _pair(user_a_id, user_b_id)
+    conversation = Conversation.objects.filter(user_low_id=low, user_high_id=high).first()
+    if conversation is not None:
+        return conversation
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(user_low_id=low, user_high_id=high)
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=low, peer_id=high),
+                ConversationMember(conversation=conversation, user_id=high, peer_id=low),
+            ])
+    except IntegrityError:  # created concurrently by the other participant
+        conversation = Conversation.objects.get(user_low_id=low, user_high_id=high)
+    return conversation
+
+
+def record_message(message):
+    """Update the conversation summary and the receiver's unread count for a new message."""
+    if not message.sender_id or not message.receiver_id:
+        return None
+    conversation = get_or_create_conversation(message.sender_id, message.receiver_id)
+    Conversation.objects.filter(pk=conversation.pk).update(
+        last_message=message,
+        last_message_preview=message.message[:PREVIEW_LENGTH],
+        last_message_at=message.timestamp,
+    )
+    ConversationMember.objects.filter(conversation=conversation).update(
+        last_message_at=message.timestamp,
+        unread_count=Case(
+            When(user_id=message.receiver_id, then=F('unread_count') + 1),
+            default=F('unread_count'),
+            output_field=PositiveIntegerField(),
+        ),
+    )
+    increment_unread(message)
+    return conversation
+
+
+def mark_conversation_read(user, peer):
+    """
+    Move ``user``'s read watermark up to the latest message with ``peer``.
+    Returns the new watermark, or None if there was nothing new to read.
+    """
+    clear_unread(user.pk, peer.pk)
+    conversation = get_conversation(user.pk, peer.pk)
+    if conversation is None or conversation.last_message_id is None:
+        return None
+    moved = ConversationMember.objects.filter(
+        Q(last_read_message__isnull=True) | Q(last_read_message__lt=conversation.last_message_id),
+        conversation=conversation,
+        user=user,
+    ).update(last_read_message_id=conversation.last_message_id, unread_count=0)
+    return conversation.last_message_id if moved else None
+
+
+def read_watermark(user, peer):
+    """Id of the last message ``user`` has read in their conversation with ``peer`` (0 if none)."""
+    watermark = ConversationMember.objects.filter(
+        conversation__user_low_id=min(user.pk, peer.pk),
+        conversation__user_high_id=max(user.pk, peer.pk),
+        user=user,
+    ).values_list('last_read_message_id', flat=True).first()
+    return watermark or 0
+
+
+def unread_subquery():
+    """Per-member count of peer messages past the member's read watermark, for annotations."""
+    return Coalesce(
+        Subquery(
+            ChatMessage.objects.filter(
+                sender=OuterRef('peer_id'),
+                receiver=OuterRef('user_id'),
+                id__gt=Coalesce(OuterRef('last_read_message_id'), 0),
+            )
+            .order_by()
+            .values('receiver')
+            .annotate(total=Count('id'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def reconcile_members(members):
+    """Recompute unread counts from the read watermarks. Returns ``(corrected, members)``."""
+    members = list(members.annotate(actual_unread=unread_subquery()).only('id', 'user_id', 'unread_count'))
+    stale = []
+    for member in members:
+        if member.unread_count != member.actual_unread:
+            member.unread_count = member.actual_unread
+            stale.append(member)
+    with transaction.atomic():
+        ConversationMember.objects.bulk_update(stale, ['unread_count'])
+    forget_unread({member.user_id for member in members})
+    return len(stale), members
+
+
+def inbox(user):
+    """
+    The user's conversations, newest first: a range scan on member_inbox_idx,
+    meant to be paged with ``KeysetPaginator(..., field='last_message_at')``.
+    Unread conversations are highlighted rather than sorted first, since an
+    unread-first order cannot be read off the index.
+    """
+    return (
+        ConversationMember.objects.filter(user=user, last_message_at__isnull=False)
+        .select_related('peer', 'conversation')
+        .order_by('-last_message_at', '-id')
+    )
+
+
+def thread(user, peer):
+    """Messages exchanged between two users, in either direction."""
+    return ChatMessage.objects.filter(
+        Q(sender=user, receiver=peer) | Q(sender=peer, receiver=user)
+    )
+
+
+def message_window(user, peer, limit, before=None):
+    """
+    Return ``(messages, has_more)``: the ``limit`` newest messages of the thread
+    (older than message ``before`` if given), oldest first. Each direction is a
+    range scan on the (sender, receiver, timestamp) index.
+    """
+    messages = thread(user, peer)
+    if before is not None:
+        messages = messages.filter(
+            Q(timestamp__lt=before.timestamp) | Q(timestamp=before.timestamp, id__lt=before.id)
+        )
+    rows = list(messages.select_related('sender').order_by('-timestamp', '-id')[:limit + 1])
+    has_more = len(rows) > limit
+    return rows[:limit][::-1], has_more
@@ -0,0 +1,72 @@
+"""
+Per-user set of profiles already sent an interest, for rendering the feed.
+
+The set is a sorted ``array('q')`` of receiver profile ids, 8 bytes per id,
+cached as raw bytes under contacted_profiles:<user_id>. Membership is a bisect,
+so badging a page of cards costs O(page * log n) however long the user's
+history is. The feed can also leave contacted profiles out altogether in SQL
+(see search.search_profiles), which needs no set at all.
+"""
+from array import array
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+
+from .models import ProfileInterest
+
+
+CONTACTED_TIMEOUT = 60 * 60
+
+
+class ContactedSet:
+    __slots__ = ('ids',)
+
+    def __init__(self, ids=None):
+        self.ids = ids if ids is not None else array('q')
+
+    @classmethod
+    def from_bytes(cls, data):
+        ids = array('q')
+        ids.frombytes(data)
+        return cls(ids)
+
+    def __contains__(self, profile_id):
+        index = bisect_left(self.ids, profile_id)
+        return index < len(self.ids) and self.ids[index] == profile_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, profile_id):
+        if profile_id not in self:
+            insort(self.ids, profile_id)
+
+
+def _key(user_id):
+    return f'contacted_profiles:{user_id}'
+
+
+def get_contacted(user_id):
+    """The ContactedSet of ``user_id``; a miss is loaded in id order from the (sender, receiver) index."""
+    data = cache.get(_key(user_id))
+    if data is not None:
+        return ContactedSet.from_bytes(data)
+    ids = array('q', (
+        ProfileInterest.objects.filter(sender_id=user_id)
+        .order_by('receiver_id').values_list('receiver_id', flat=True)
+    ))
+    cache.set(_key(user_id), ids.tobytes(), CONTACTED_TIMEOUT)
+    return ContactedSet(ids)
+
+
+def record_contact(user_id, profile_id):
+    """
+    Add ``profile_id`` to a cached set. Users without one load it fresh on their
+    next read; concurrent sends may race and drop an id until the entry times out.
+    """
+    data = cache.get(_key(user_id))
+    if data is None:
+        return
+    contacted = ContactedSet.from_bytes(data)
+    contacted.add(profile_id)
+    cache.set(_key(user_id), contacted.ids.tobytes(), CONTACTED_TIMEOUT)
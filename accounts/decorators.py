@@ -0,0 +1,66 @@
+from collections import namedtuple
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.shortcuts import redirect
+
+from .models import UserProfile
+
+
+OnboardingState = namedtuple('OnboardingState', ['has_profile', 'has_identity_proof', 'is_verified', 'has_gender'])
+
+
+def load_onboarding(request):
+    """
+    Load the caller's profile and onboarding state once per request and attach
+    them as ``request.user_profile`` and ``request.onboarding``.
+    """
+    if not hasattr(request, 'onboarding'):
+        profile = UserProfile.objects.filter(user=request.user).first()
+        if profile is not None:
+            profile.user = request.user  # reuse the already loaded user row
+        request.user_profile = profile
+        request.onboarding = OnboardingState(
+            has_profile=profile is not None,
+            has_identity_proof=bool(profile and profile.identity_proof),
+            is_verified=bool(request.user.is_verified),
+            has_gender=bool(profile and profile.gender),
+        )
+    return request.onboarding
+
+
+def _onboarding_redirect(request, state, require_gender):
+    if not state.has_identity_proof:
+        messages.warning(request, "You must complete your profile first.")
+        return redirect('create_profile')
+    if not state.is_verified:
+        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
+        return redirect('create_profile')
+    if require_gender and not state.has_gender:
+        return redirect('create_profile')
+    return None
+
+
+def onboarding_required(view_func=None, require_gender=False):
+    """
+    Redirect to profile creation until the user has uploaded an identity proof
+    and been verified by an admin (and, optionally, has set a gender).
+    Use together with ``login_required``. Works on sync and async views.
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def _wrapped_view(request, *args, **kwargs):
+                state = await sync_to_async(load_onboarding)(request)
+                return _onboarding_redirect(request, state, require_gender) or await func(request, *args, **kwargs)
+        else:
+            @wraps(func)
+            def _wrapped_view(request, *args, **kwargs):
+                state = load_onboarding(request)
+                return _onboarding_redirect(request, state, require_gender) or func(request, *args, **kwargs)
+        return _wrapped_view
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
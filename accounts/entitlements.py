@@ -0,0 +1,80 @@
+"""
+Premium entitlements, cached per user.
+
+A user is premium while one of their PremiumUser rows has is_premium set and
+an expiry_date after today (IST). The cache keeps the end of that window, the
+latest such expiry_date, and times the entry out when the window closes, so a
+lapsed subscription never reads as active. Non-premium users are cached as
+NOT_PREMIUM for a few minutes. Saving or deleting a PremiumUser row drops the
+user's entry (see signals.py), and so does the expire_premium sweeper; both
+need the shared cache from settings.CACHES to reach every process. The short
+NOT_PREMIUM timeout bounds how long an upgrade can go unseen if a drop is lost.
+"""
+from datetime import datetime, time
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import PremiumUser
+
+
+NOT_PREMIUM = 0
+NOT_PREMIUM_TIMEOUT = 5 * 60
+
+
+def _key(user_id):
+    return f'premium_until:{user_id}'
+
+
+def _timeout(until):
+    """Seconds until ``until`` starts in the current time zone, when the window closes."""
+    closes = timezone.make_aware(datetime.combine(until, time.min))
+    return max(1, int((closes - timezone.now()).total_seconds()))
+
+
+def _load(user_ids):
+    """``{user_id: expiry date}`` for the users in ``user_ids`` with an active subscription."""
+    return dict(
+        PremiumUser.objects.filter(user_id__in=user_ids, is_premium=True, expiry_date__gt=timezone.localdate())
+        .values('user_id')
+        .annotate(until=Max('expiry_date'))
+        .values_list('user_id', 'until')
+    )
+
+
+def premium_windows(user_ids):
+    """
+    ``{user_id: expiry date}`` for every premium user among ``user_ids``, read
+    with one get_many; misses are loaded with one query and cached.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    keys = {_key(user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys)
+    windows = {keys[key]: until for key, until in cached.items() if until != NOT_PREMIUM}
+    missing = [user_id for key, user_id in keys.items() if key not in cached]
+    if missing:
+        loaded = _load(missing)
+        for user_id, until in loaded.items():
+            cache.set(_key(user_id), until, _timeout(until))
+        cache.set_many(
+            {_key(user_id): NOT_PREMIUM for user_id in missing if user_id not in loaded},
+            NOT_PREMIUM_TIMEOUT,
+        )
+        windows.update(loaded)
+    return windows
+
+
+def premium_until(user_id):
+    """The date ``user_id``'s premium access ends, or None if they have none."""
+    return premium_windows([user_id]).get(user_id)
+
+
+def is_premium(user_id):
+    return premium_until(user_id) is not None
+
+
+def forget_premium(user_ids):
+    cache.delete_many([_key(user_id) for user_id in user_ids])
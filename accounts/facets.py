@@ -0,0 +1,215 @@
+"""
+Counts behind the feed dropdowns (country, state, city, caste).
+
+The options listed are the values present among verified profiles of the
+feed scope (the normalized gender the feed shows, or '' for all genders).
+For each (scope, field) the cache holds the list of values plus one integer
+counter per value; profile saves, deletes and verification changes move
+those counters with ``cache.incr``/``decr``, so concurrent edits never
+overwrite each other. A value seen for the first time, or a counter that is
+gone, drops the value list so the next read rebuilds the facet with one
+GROUP BY on ProfileSearch. Everything is rebuilt at most hourly, which also
+repairs drift from races between a rebuild and an increment.
+
+With no other filter active the counts shown are those counters. Otherwise
+each option shows how many results picking it would give under the other
+active filters: one GROUP BY per field on the indexed ProfileSearch table,
+cached briefly per filter combination.
+
+Display labels (the most common spelling of each value) are rebuilt by the
+``rebuild_facets`` job, never inside a feed request; a value saved since the
+last rebuild is labelled with the spelling it was saved with.
+"""
+import hashlib
+import json
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import ProfileSearch, UserProfile
+from .search import normalize, search_profiles
+
+
+FACET_FIELDS = ['country', 'state', 'city', 'caste']
+DROPDOWN_NAMES = {'country': 'countries', 'state': 'states', 'city': 'cities', 'caste': 'castes'}
+FACET_TIMEOUT = 60 * 60  # full rebuild at most hourly, in case increments were lost
+SCOPED_TIMEOUT = 5 * 60
+LABELS_TIMEOUT = 24 * 60 * 60  # outlives a few missed rebuild_facets runs
+ALL_GENDERS = ''
+
+FacetOption = namedtuple('FacetOption', ['value', 'count'])
+
+
+def _values_key(scope, field):
+    return f'profile_facets:{scope}:{field}'
+
+
+def _count_key(scope, field, value):
+    # Values contain spaces and punctuation; hash them into a key every backend accepts
+    return f'profile_facets:{scope}:{field}:{hashlib.md5(value.encode()).hexdigest()}'
+
+
+def _labels_key(field):
+    return f'profile_facets:labels:{field}'
+
+
+def _build(scope, field):
+    """Count verified profiles in ``scope`` per ``field`` value and cache the result."""
+    rows = ProfileSearch.objects.filter(is_verified=True).exclude(**{field: ''})
+    if scope:
+        rows = rows.filter(gender=scope)
+    counts = {row[field]: row['total'] for row in rows.values(field).annotate(total=Count('id')).order_by()}
+    # Counters outlive the value list slightly so increments never land on an expired counter mid-window
+    cache.set_many({_count_key(scope, field, value): total for value, total in counts.items()}, FACET_TIMEOUT + 60)
+    cache.set(_values_key(scope, field), list(counts), FACET_TIMEOUT)
+    return counts
+
+
+def build_labels(field):
+    """
+    Display label per normalized value: the spelling most profiles use, so
+    values differing only in case/spacing share one dropdown entry. A full
+    GROUP BY over UserProfile, so only run from ``rebuild_facets``.
+    """
+    best = {}
+    rows = (
+        UserProfile.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        .values(field).annotate(total=Count('id')).order_by()
+    )
+    for row in rows:
+        key = normalize(row[field])
+        if key not in best or row['total'] > best[key][1]:
+            best[key] = (row[field].strip(), row['total'])
+    labels = {key: label for key, (label, _) in best.items()}
+    cache.set(_labels_key(field), labels, LABELS_TIMEOUT)
+    return labels
+
+
+def record_labels(profile):
+    """Label values ``profile`` introduced with its own spelling until the next rebuild."""
+    cached = cache.get_many([_labels_key(field) for field in FACET_FIELDS])
+    for field in FACET_FIELDS:
+        labels = cached.get(_labels_key(field))
+        raw = (getattr(profile, field) or '').strip()
+        value = normalize(raw)
+        if labels is not None and value and value not in labels:
+            labels[value] = raw
+            cache.set(_labels_key(field), labels, LABELS_TIMEOUT)
+
+
+def get_facet_counts(scope=ALL_GENDERS, fields=FACET_FIELDS):
+    """Return ``{field: {normalized value: count}}`` for ``scope`` from the cached counters."""
+    cached = cache.get_many([_values_key(scope, field) for field in fields])
+    result = {}
+    for field in fields:
+        values = cached.get(_values_key(scope, field))
+        if values is None:
+            result[field] = _build(scope, field)
+            continue
+        keys = {_count_key(scope, field, value): value for value in values}
+        counts = cache.get_many(keys)
+        if len(counts) < len(keys):
+            result[field] = _build(scope, field)
+        else:
+            result[field] = {keys[key]: total for key, total in counts.items()}
+    return result
+
+
+def _contributions(entry):
+    """The (scope, field, value) counters a ProfileSearch entry adds to."""
+    if entry is None or not entry.is_verified:
+        return set()
+    scopes = {ALL_GENDERS, entry.gender} if entry.gender else {ALL_GENDERS}
+    return {
+        (scope, field, getattr(entry, field))
+        for scope in scopes for field in FACET_FIELDS if getattr(entry, field)
+    }
+
+
+def record_profile_change(old_entry, new_entry):
+    """
+    Move the counters from ``old_entry`` to ``new_entry`` (ProfileSearch rows
+    before and after a change; None for a new or deleted profile). Facets that
+    are not cached yet are left alone and built on next read.
+    """
+    old, new = _contributions(old_entry), _contributions(new_entry)
+    removed, added = old - new, new - old
+    if not removed and not added:
+        return
+    facets = {(scope, field) for scope, field, _ in removed | added}
+    cached = cache.get_many([_values_key(scope, field) for scope, field in facets])
+    stale = set()
+    for scope, field, value in removed:
+        if _values_key(scope, field) in cached:
+            try:
+                cache.decr(_count_key(scope, field, value))
+            except ValueError:
+                stale.add((scope, field))
+    for scope, field, value in added:
+        values = cached.get(_values_key(scope, field))
+        if values is None:
+            continue
+        if value not in values:
+            # New option: rebuild the value list on next read
+            stale.add((scope, field))
+            continue
+        try:
+            cache.incr(_count_key(scope, field, value))
+        except ValueError:
+            stale.add((scope, field))
+    if stale:
+        cache.delete_many([_values_key(scope, field) for scope, field in stale])
+
+
+def forget_facets():
+    """Drop every cached facet, e.g. after a bulk update that skipped the per-row hooks."""
+    scopes = [ALL_GENDERS] + [normalize(value) for value, _ in UserProfile.GENDER_CHOICES]
+    cache.delete_many([_values_key(scope, field) for scope in scopes for field in FACET_FIELDS])
+
+
+def get_scoped_counts(gender=None, min_age=None, max_age=None, **filters):
+    """
+    For each facet field, count matching verified profiles per value while
+    applying every *other* active filter, i.e. how many results picking that
+    option would give. Cached briefly per filter combination.
+    """
+    params = {'gender': normalize(gender), 'min_age': min_age or '', 'max_age': max_age or ''}
+    params.update({field: normalize(filters.get(field)) for field in FACET_FIELDS})
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    key = f'profile_facets:scoped:{digest}'
+    scoped = cache.get(key)
+    if scoped is None:
+        scoped = {}
+        for field in FACET_FIELDS:
+            other_filters = {f: v for f, v in filters.items() if f != field}
+            rows = (
+                search_profiles(gender=gender, min_age=min_age, max_age=max_age, **other_filters)
+                .exclude(**{field: ''})
+                .values(field)
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            scoped[field] = {row[field]: row['total'] for row in rows}
+        cache.set(key, scoped, SCOPED_TIMEOUT)
+    return scoped
+
+
+def get_dropdowns(gender=None, min_age=None, max_age=None, **filters):
+    """Build the feed dropdown options as ``FacetOption(value, count)`` lists for the template."""
+    counts = get_facet_counts(normalize(gender))
+    if min_age or max_age or any(normalize(filters.get(field)) for field in FACET_FIELDS):
+        scoped = get_scoped_counts(gender=gender, min_age=min_age, max_age=max_age, **filters)
+    else:
+        scoped = counts
+    cached_labels = cache.get_many([_labels_key(field) for field in FACET_FIELDS])
+    dropdowns = {}
+    for field in FACET_FIELDS:
+        labels = cached_labels.get(_labels_key(field), {})
+        options = [
+            FacetOption(labels.get(value) or value.title(), scoped[field].get(value, 0))
+            for value, total in counts[field].items() if total > 0
+        ]
+        options.sort(key=lambda option: option.value.casefold())
+        dropdowns[DROPDOWN_NAMES[field]] = options
+    return dropdowns
@@ -1,6 +1,24 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import UserProfile, Feedback, PremiumUser
+from .uploads import validate_image_upload, validate_receipt_upload
+
+
+class BoundedImageField(forms.ImageField):
+    """ImageField that checks the byte count and header dimensions before Pillow verifies the file."""
+    def to_python(self, data):
+        if data not in self.empty_values:
+            validate_image_upload(data)
+        return super().to_python(data)
+
+
+class ReceiptField(forms.FileField):
+    """Payment receipt: a PDF, or an image within the same limits as photos."""
+    def to_python(self, data):
+        data = super().to_python(data)
+        if data is not None:
+            validate_receipt_upload(data)
+        return data
 
 User = get_user_model()
 
@@ -19,6 +37,7 @@ class UserProfileForm(forms.ModelForm):
     class Meta:
         model = UserProfile
         exclude = ['user', 'uid', 'created_at', 'updated_at', 'user_identity']
+        field_classes = {'image': BoundedImageField, 'identity_proof': BoundedImageField}
         widgets = {
             'caste': forms.Select(attrs={'class': 'select2 form-control'}),
             'phone_no': forms.TextInput(attrs={
@@ -53,6 +72,7 @@ class PremiumUserForm(forms.ModelForm):
     class Meta:
         model = PremiumUser
         fields = ['amount', 'mobile', 'transaction_id', 'receipt']
+        field_classes = {'receipt': ReceiptField}
         widgets = {
             'amount': forms.NumberInput(attrs={'placeholder': 'Enter amount'}),
             'mobile': forms.TextInput(attrs={'placeholder': 'Enter mobile number'}),
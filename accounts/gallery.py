@@ -0,0 +1,117 @@
+"""
+Gallery ingest: compress a batch of uploaded photos in parallel, then insert
+them with one bulk_create. Unless IMAGE_PROCESSING_SYNC is set the raw files
+are inserted instead and left to the background workers (see processing.py).
+
+Compression is CPU-bound Pillow work, so it runs on a process pool; a batch
+takes about as long as its largest photo instead of the sum of all of them.
+Workers receive a temp-file path (or the raw bytes for in-memory uploads) and
+return the compressed JPEG bytes with its display variants; the worker function
+lives in images.py so a spawned worker never has to import the models. Photos
+seen before are matched by digest first and never reach the pool.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from PIL import UnidentifiedImageError
+
+from .blobs import acquire, settings_key, source_digest, store
+from .images import compress_with_variants
+from .models import MediaSource, UploadImage
+from .uploads import validate_image_upload
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_pool():
+    return ProcessPoolExecutor(max_workers=settings.GALLERY_UPLOAD_WORKERS)
+
+
+def _payload(upload):
+    """What a worker needs to read the upload: a path for temp files, bytes otherwise."""
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload.read()
+
+
+def compress_uploads(uploads, max_kb=UploadImage.MAX_IMAGE_SIZE_KB,
+                     size=(UploadImage.STANDARD_WIDTH, UploadImage.STANDARD_HEIGHT)):
+    """
+    Compress ``uploads`` in parallel. Returns ``(compressed, rejected)``:
+    ``(upload, jpeg_bytes, variants)`` for each readable upload in order, and
+    the uploads that could not be decoded or compressed under ``max_kb``.
+    """
+    payloads = [_payload(upload) for upload in uploads]
+    if len(payloads) > 1 and settings.GALLERY_UPLOAD_WORKERS > 1:
+        try:
+            futures = [get_pool().submit(compress_with_variants, p, max_kb, size) for p in payloads]
+            outcomes = [_outcome(future.result) for future in futures]
+        except BrokenProcessPool:
+            logger.exception("Gallery pool broke; compressing in-process")
+            get_pool.cache_clear()
+            outcomes = None
+    else:
+        outcomes = None
+    if outcomes is None:
+        outcomes = [_outcome(compress_with_variants, p, max_kb, size) for p in payloads]
+    compressed, rejected = [], []
+    for upload, outcome in zip(uploads, outcomes):
+        if outcome is None:
+            rejected.append(upload)
+        else:
+            compressed.append((upload, *outcome))
+    return compressed, rejected
+
+
+def _outcome(func, *args):
+    try:
+        return func(*args)
+    except (ValidationError, UnidentifiedImageError, OSError):
+        return None
+
+
+def ingest_gallery(profile, uploads):
+    """Compress and store gallery photos for ``profile``; returns (created, rejected)."""
+    rejected = []
+    for upload in uploads:
+        # Oversized files and decompression bombs never reach the digest or the pool
+        try:
+            validate_image_upload(upload)
+        except ValidationError:
+            rejected.append(upload)
+    uploads = [upload for upload in uploads if upload not in rejected]
+    if not uploads:
+        return [], rejected
+    key = settings_key(UploadImage)
+    sources = {upload: source_digest(upload, key) for upload in uploads}
+    known = {
+        source.digest: source.blob
+        for source in MediaSource.objects.select_related('blob').filter(digest__in=sources.values())
+    }
+    rows, fresh = [], []
+    for upload in uploads:
+        # Photos uploaded before (by anyone) reuse the stored blob: no Pillow, no write
+        blob = known.get(sources[upload])
+        if blob is not None and acquire(blob):
+            rows.append(UploadImage(galary=profile, image=blob.name, image_dhash=blob.dhash))
+        else:
+            fresh.append(upload)
+    if fresh and not settings.IMAGE_PROCESSING_SYNC:
+        # Store the raw files; run_image_processing compresses them in the background
+        rows += [UploadImage(galary=profile, image=upload, image_state='processing') for upload in fresh]
+    elif fresh:
+        compressed, failed = compress_uploads(fresh)
+        rejected += failed
+        for upload, data, variants in compressed:
+            blob = store(data, sources[upload], variants)
+            while not acquire(blob):
+                blob = store(data, sources[upload], variants)
+            rows.append(UploadImage(galary=profile, image=blob.name, image_dhash=blob.dhash))
+    return UploadImage.objects.bulk_create(rows), rejected
@@ -0,0 +1,225 @@
+"""
+Shared JPEG compressor for profile photos, gallery images and premium receipts.
+
+Large JPEGs are decoded with ``draft()`` at the smallest DCT scale that still
+covers the target box, so a 12 MP phone photo is never fully decoded just to be
+thumbnailed to 800px. The quality is then found on the same 85..30 ladder the
+old per-model loops walked down one step at a time, but by predicting it from
+the size of the first encode and narrowing a bracket, so the result is the same
+with a few encodes instead of up to 12.
+"""
+import io
+import os
+import uuid
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image
+
+
+MAX_IMAGE_SIZE_KB = 200
+STANDARD_SIZE = (800, 800)
+# Largest resolution accepted, checked against the header before anything is decoded
+MAX_IMAGE_PIXELS = 40_000_000
+# Highest quality first, same ladder the per-model loops used
+QUALITY_LADDER = tuple(range(85, 29, -5))
+# Typical baseline-JPEG size at each ladder quality relative to quality 85
+RELATIVE_SIZE = (1.00, 0.85, 0.73, 0.65, 0.58, 0.53, 0.48, 0.45, 0.41, 0.37, 0.34, 0.30)
+
+# Display variants, largest first so each one is thumbnailed from the previous
+VARIANT_WIDTHS = (480, 240, 96)
+VARIANT_FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+VARIANT_QUALITY = 80
+
+CompressionResult = namedtuple('CompressionResult', ['data', 'quality', 'encodes'])
+Variant = namedtuple('Variant', ['width', 'ext', 'data'])
+
+
+def read_header(source):
+    """
+    Open ``source`` without decoding it and reject resolutions above
+    MAX_IMAGE_PIXELS; Pillow only reads the header until pixels are accessed.
+    """
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    try:
+        image = Image.open(source)
+    except Image.DecompressionBombError as exc:
+        raise ValidationError(str(exc), code='image_too_large')
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ValidationError(
+            f"Image is {width}x{height} pixels; at most {MAX_IMAGE_PIXELS // 1_000_000} megapixels are accepted.",
+            code='image_too_large',
+        )
+    return image
+
+
+def open_image(source, size=STANDARD_SIZE):
+    """Open ``source`` and let the JPEG decoder downscale while decoding."""
+    image = read_header(source)
+    if image.format == 'JPEG':
+        image.draft('RGB', size)
+    return image
+
+
+def prepare(image, size=STANDARD_SIZE):
+    """Convert to a JPEG-compatible mode and fit inside ``size`` (aspect ratio kept)."""
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail(size)
+    return image
+
+
+def _encode(image, quality, buffer):
+    buffer.seek(0)
+    buffer.truncate()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.tell()
+
+
+def _estimate_index(lo, lo_size, hi, max_bytes):
+    """Guess the first ladder index in (lo, hi) that fits, scaling the size measured at ``lo``."""
+    for index in range(lo + 1, hi - 1):
+        if lo_size * RELATIVE_SIZE[index] / RELATIVE_SIZE[lo] <= max_bytes:
+            return index
+    return hi - 1
+
+
+def encode_to_size(image, max_bytes):
+    """
+    Return the highest-quality encoding on the ladder that fits in ``max_bytes``.
+
+    Most photos fit at the top quality, so that is tried first. Otherwise the
+    size of the last too-large encode predicts the next quality to try, and once
+    a probe fits the remaining bracket is bisected, which usually settles in two
+    or three encodes. Two buffers are reused for the whole search: one holds the
+    best fitting encode so far, the other the current trial.
+    """
+    best, trial = io.BytesIO(), io.BytesIO()
+    size = _encode(image, QUALITY_LADDER[0], best)
+    encodes = 1
+    if size <= max_bytes:
+        return CompressionResult(best.getvalue(), QUALITY_LADDER[0], encodes)
+    best_quality = None
+    # QUALITY_LADDER[lo] is known too large, QUALITY_LADDER[hi] (if in range) is known to fit
+    lo, lo_size, hi = 0, size, len(QUALITY_LADDER)
+    while hi - lo > 1:
+        if best_quality is None:
+            index = _estimate_index(lo, lo_size, hi, max_bytes)
+        else:
+            index = (lo + hi) // 2
+        size = _encode(image, QUALITY_LADDER[index], trial)
+        encodes += 1
+        if size <= max_bytes:
+            hi, best_quality = index, QUALITY_LADDER[index]
+            best, trial = trial, best
+        else:
+            lo, lo_size = index, size
+    if best_quality is None:
+        raise ValidationError(
+            f"Image cannot be compressed below {max_bytes // 1024} KB. Please upload a smaller image."
+        )
+    return CompressionResult(best.getvalue(), best_quality, encodes)
+
+
+def compress(source, max_kb=MAX_IMAGE_SIZE_KB, size=STANDARD_SIZE):
+    """Compress an uploaded image; returns a CompressionResult."""
+    image = prepare(open_image(source, size), size)
+    return encode_to_size(image, max_kb * 1024)
+
+
+def dhash(image, size=8):
+    """
+    64-bit difference hash: shrink to 9x8 greyscale and record whether each
+    pixel is brighter than its right neighbour. Re-encoding, resizing and mild
+    edits flip only a few bits, so near-duplicates are a small Hamming distance apart.
+    """
+    if image.format == 'JPEG':
+        image.draft('L', (size * 8, size * 8))
+    pixels = list(image.convert('L').resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            value = (value << 1) | (left > pixels[row * (size + 1) + col + 1])
+    return value
+
+
+def dhash_bytes(data):
+    with Image.open(io.BytesIO(data)) as image:
+        return dhash(image)
+
+
+def render_variants(image):
+    """Encode ``image`` at every VARIANT_WIDTHS width (never upscaled) in every VARIANT_FORMATS format."""
+    image = image.copy()
+    variants = []
+    buffer = io.BytesIO()
+    for width in VARIANT_WIDTHS:
+        image.thumbnail((width, image.height))
+        for ext, image_format in VARIANT_FORMATS:
+            buffer.seek(0)
+            buffer.truncate()
+            image.save(buffer, format=image_format, quality=VARIANT_QUALITY)
+            variants.append(Variant(width, ext, buffer.getvalue()))
+    return variants
+
+
+def variant_name(name, width, ext):
+    """Deterministic storage path of a variant: variants/<original path>_<width>.<ext>."""
+    stem = os.path.splitext(name)[0]
+    return f"variants/{stem}_{width}.{ext}"
+
+
+def save_variants(storage, name, variants):
+    """Write rendered variants of the stored file ``name``, replacing any old copies."""
+    for variant in variants:
+        path = variant_name(name, variant.width, variant.ext)
+        if storage.exists(path):
+            storage.delete(path)
+        storage.save(path, ContentFile(variant.data))
+
+
+def delete_variants(storage, name):
+    for width in VARIANT_WIDTHS:
+        for ext, _ in VARIANT_FORMATS:
+            path = variant_name(name, width, ext)
+            if storage.exists(path):
+                storage.delete(path)
+
+
+def generate_variants(field_file):
+    """Render and store the display variants of a saved image field."""
+    render_stored_variants(field_file.storage, field_file.name)
+
+
+def render_stored_variants(storage, name):
+    with storage.open(name, 'rb') as source:
+        image = prepare(open_image(source, (VARIANT_WIDTHS[0],) * 2), (VARIANT_WIDTHS[0],) * 2)
+        variants = render_variants(image)
+    save_variants(storage, name, variants)
+
+
+def _read_payload(payload):
+    return open(payload, 'rb') if isinstance(payload, str) else io.BytesIO(payload)
+
+
+def compress_to_bytes(payload, max_kb=MAX_IMAGE_SIZE_KB, size=STANDARD_SIZE):
+    """Process-pool entry point: compress a file path or raw bytes, return JPEG bytes."""
+    with _read_payload(payload) as source:
+        return compress(source, max_kb, size).data
+
+
+def compress_with_variants(payload, max_kb=MAX_IMAGE_SIZE_KB, size=STANDARD_SIZE):
+    """Process-pool entry point: compressed JPEG bytes plus its rendered display variants."""
+    with _read_payload(payload) as source:
+        image = prepare(open_image(source, size), size)
+    return encode_to_size(image, max_kb * 1024).data, render_variants(image)
+
+
+def compress_image(source, max_kb=MAX_IMAGE_SIZE_KB, size=STANDARD_SIZE):
+    """Compress an uploaded image to a JPEG ContentFile under ``max_kb``."""
+    result = compress(source, max_kb, size)
+    return ContentFile(result.data, name=f"{uuid.uuid4()}.jpg")
@@ -0,0 +1,66 @@
+"""
+Sending interests, one profile or a whole shortlist at a time.
+
+``send_interests`` is idempotent: profiles the sender already contacted are
+skipped before any quota is spent, and the rows are inserted with
+``bulk_create(ignore_conflicts=True)`` so a double click or a concurrent
+request can never raise on the (sender, receiver) constraint. Free users
+claim quota for the whole batch in one cache increment; whatever a race
+stopped from being inserted is refunded. One notification email per new
+receiver is queued in a single outbox INSERT. New interests that complete a
+mutual pair become matches once committed (see matches.py).
+"""
+from collections import namedtuple
+from functools import partial
+
+from django.db import transaction
+
+from .contacted import record_contact
+from .entitlements import is_premium
+from .matches import record_matches
+from .models import ProfileInterest, UserProfile
+from .outbox import enqueue_many
+from .quota import claim_interests, refund_interest
+from .utils import build_interest_email
+
+
+MAX_BULK_INTERESTS = 50
+
+# Profile ids: newly sent to, already sent to before, and left out by the daily quota
+InterestResult = namedtuple('InterestResult', ['sent', 'already_sent', 'over_quota'])
+
+
+def send_interests(sender, profile_ids):
+    profile_ids = list(dict.fromkeys(profile_ids))[:MAX_BULK_INTERESTS]
+    receivers = (
+        UserProfile.objects.filter(id__in=profile_ids).exclude(user=sender)
+        .select_related('user').in_bulk()
+    )
+    already_sent = set(
+        ProfileInterest.objects.filter(sender=sender, receiver_id__in=receivers)
+        .values_list('receiver_id', flat=True)
+    )
+    targets = [pk for pk in profile_ids if pk in receivers and pk not in already_sent]
+    limited = bool(targets) and not is_premium(sender.id)
+    granted = claim_interests(sender.id, len(targets)) if limited else len(targets)
+    targets, over_quota = targets[:granted], targets[granted:]
+
+    rows = [ProfileInterest(sender=sender, receiver_id=pk) for pk in targets]
+    with transaction.atomic():
+        ProfileInterest.objects.bulk_create(rows, ignore_conflicts=True)
+        # ignore_conflicts leaves no pks behind; our rows are the ones carrying our uids
+        inserted = set(
+            ProfileInterest.objects.filter(uid__in=[row.uid for row in rows])
+            .values_list('receiver_id', flat=True)
+        )
+        sender_profile = getattr(sender, 'profile', None)
+        enqueue_many(build_interest_email(receivers[pk], sender, sender_profile) for pk in targets if pk in inserted)
+    if limited and len(inserted) < len(targets):
+        refund_interest(sender.id, len(targets) - len(inserted))
+    for pk in targets:
+        record_contact(sender.id, pk)
+    sent = [pk for pk in targets if pk in inserted]
+    if sent:
+        transaction.on_commit(partial(record_matches, sender, [receivers[pk] for pk in sent]))
+    already_sent.update(pk for pk in targets if pk not in inserted)
+    return InterestResult(sent, [pk for pk in profile_ids if pk in already_sent], over_quota)
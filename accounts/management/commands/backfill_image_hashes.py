@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from PIL import Image, UnidentifiedImageError
+
+from accounts.images import dhash
+from accounts.models import MediaBlob, UploadImage, UserProfile
+from accounts.similarity import to_signed
+
+
+class Command(BaseCommand):
+    help = "Compute the perceptual hash of processed profile and gallery images that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        for model in (UserProfile, UploadImage):
+            hashed, failed = self.backfill(model, options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: hashed {hashed}, failed {failed}."))
+
+    def backfill(self, model, chunk_size):
+        hashed = failed = 0
+        last_pk = 0
+        queryset = (
+            model.objects.filter(image_state='ready', image_dhash__isnull=True)
+            .exclude(image='').exclude(image__isnull=True).order_by('pk')
+        )
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).only('pk', 'image')[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            # Rows sharing a blob are hashed once; the blob remembers it for later uploads
+            by_name = {}
+            for row in rows:
+                by_name.setdefault(row.image.name, []).append(row.pk)
+            blobs = dict(MediaBlob.objects.filter(name__in=by_name, dhash__isnull=False).values_list('name', 'dhash'))
+            for name, pks in by_name.items():
+                value = blobs.get(name)
+                if value is None:
+                    try:
+                        with model.objects.get(pk=pks[0]).image.open('rb') as field_file, Image.open(field_file) as image:
+                            value = to_signed(dhash(image))
+                    except (OSError, UnidentifiedImageError) as exc:
+                        failed += len(pks)
+                        self.stderr.write(f"{name}: {exc}")
+                        continue
+                    MediaBlob.objects.filter(name=name, dhash__isnull=True).update(dhash=value)
+                # Only rows whose image is still this file; it may have been replaced meanwhile
+                hashed += model.objects.filter(pk__in=pks, image=name).update(image_dhash=value)
+        return hashed, failed
@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from PIL import UnidentifiedImageError
+
+from accounts.images import VARIANT_WIDTHS, generate_variants, variant_name
+from accounts.models import UploadImage, UserProfile
+from accounts.templatetags.media_tags import VARIANTS_TIMEOUT
+
+
+class Command(BaseCommand):
+    help = "Render the 96/240/480px WebP and JPEG variants for existing profile and gallery images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--force', action='store_true', help="Re-render variants that already exist")
+
+    def handle(self, *args, **options):
+        for model in (UserProfile, UploadImage):
+            rendered, skipped, failed = self.backfill(model, options['chunk_size'], options['force'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: rendered {rendered}, already present {skipped}, failed {failed}."
+            ))
+
+    def backfill(self, model, chunk_size, force):
+        rendered = skipped = failed = 0
+        last_pk = 0
+        queryset = model.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).only('pk', 'image')[:chunk_size])
+            if not rows:
+                break
+            for row in rows:
+                field_file = row.image
+                marker = variant_name(field_file.name, VARIANT_WIDTHS[-1], 'jpg')
+                if not force and field_file.storage.exists(marker):
+                    skipped += 1
+                    continue
+                try:
+                    generate_variants(field_file)
+                except (OSError, UnidentifiedImageError) as exc:
+                    failed += 1
+                    self.stderr.write(f"{field_file.name}: {exc}")
+                    continue
+                cache.set(f"image_variants:{field_file.name}", True, VARIANTS_TIMEOUT)
+                rendered += 1
+            last_pk = rows[-1].pk
+        return rendered, skipped, failed
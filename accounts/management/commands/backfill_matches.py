@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.models import Match, ProfileInterest, UserProfile
+
+
+class Command(BaseCommand):
+    help = "Create Match rows for mutual interests sent before match detection existed. No emails are sent."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                ProfileInterest.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'sender_id', 'receiver_id', 'receiver__user_id')[:options['chunk_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            created += self.match_chunk(rows)
+        self.stdout.write(self.style.SUCCESS(f"Created {created} match rows."))
+
+    def match_chunk(self, rows):
+        profile_of = dict(
+            UserProfile.objects.filter(user_id__in={sender_id for _, sender_id, _, _ in rows})
+            .values_list('user_id', 'id')
+        )
+        # Reverse pairs (receiver's owner -> sender's profile) for this chunk, one query on the unique index
+        condition = Q(pk__in=[])
+        for _, sender_id, _, receiver_user_id in rows:
+            if sender_id in profile_of:
+                condition |= Q(sender_id=receiver_user_id, receiver_id=profile_of[sender_id])
+        reverse = set(ProfileInterest.objects.filter(condition).values_list('sender_id', 'receiver_id'))
+        matches, matched_pks = [], []
+        for pk, sender_id, receiver_id, receiver_user_id in rows:
+            if (receiver_user_id, profile_of.get(sender_id)) in reverse:
+                # Each side of a pair is written when its own interest comes up
+                matches.append(Match(user_id=sender_id, profile_id=receiver_id))
+                matched_pks.append(pk)
+        if not matches:
+            return 0
+        Match.objects.bulk_create(matches, ignore_conflicts=True)
+        ProfileInterest.objects.filter(pk__in=matched_pks).update(status='accepted')
+        return Match.objects.filter(uid__in=[match.uid for match in matches]).count()
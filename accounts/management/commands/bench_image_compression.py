@@ -0,0 +1,88 @@
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageDraw
+
+from accounts.images import MAX_IMAGE_SIZE_KB, STANDARD_SIZE, compress
+
+
+def legacy_compress(source, max_kb=MAX_IMAGE_SIZE_KB, size=STANDARD_SIZE):
+    """The per-model loop this replaced: full decode, then step quality down by 5."""
+    source.seek(0)
+    image = Image.open(source)
+    if image.mode in ("RGBA", "P"):
+        image = image.convert("RGB")
+    image.thumbnail(size)
+    buffer = io.BytesIO()
+    quality = 85
+    encodes = 1
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    while buffer.tell() > max_kb * 1024 and quality > 30:
+        buffer = io.BytesIO()
+        quality -= 5
+        encodes += 1
+        image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return quality, encodes
+
+
+def synthetic_photo(rng, width, height):
+    """A noisy, detailed JPEG roughly as hard to compress as a phone photo."""
+    # Colour noise at roughly the output scale survives thumbnailing, like real texture
+    grain_size = (800, 800 * height // width)
+    sigma = rng.randint(20, 80)
+    grain = Image.merge('RGB', [Image.effect_noise(grain_size, sigma) for _ in range(3)])
+    image = grain.resize((width, height), Image.NEAREST)
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(0, 40)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randint(10, width // 10)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=95)
+    return buffer
+
+
+class Command(BaseCommand):
+    help = "Compare the shared image compressor with the old per-model quality loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="Images to compress (default: synthetic photos)")
+        parser.add_argument('--count', type=int, default=10)
+        parser.add_argument('--width', type=int, default=4000)
+        parser.add_argument('--height', type=int, default=3000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['paths']:
+            sources = []
+            for path in options['paths']:
+                with open(path, 'rb') as f:
+                    sources.append(io.BytesIO(f.read()))
+        else:
+            rng = random.Random(options['seed'])
+            sources = [synthetic_photo(rng, options['width'], options['height']) for _ in range(options['count'])]
+
+        totals = {'legacy': [0.0, 0], 'shared': [0.0, 0]}
+        mismatches = 0
+        for source in sources:
+            started = time.perf_counter()
+            legacy_quality, encodes = legacy_compress(source)
+            totals['legacy'][0] += time.perf_counter() - started
+            totals['legacy'][1] += encodes
+
+            started = time.perf_counter()
+            result = compress(source)
+            totals['shared'][0] += time.perf_counter() - started
+            totals['shared'][1] += result.encodes
+            mismatches += result.quality != legacy_quality
+
+        for name, (elapsed, encodes) in totals.items():
+            self.stdout.write(
+                f"{name:>7}: {elapsed * 1000 / len(sources):8.1f} ms/image, "
+                f"{encodes / len(sources):.1f} encodes/image"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(sources)} images, {mismatches} chose a different quality than the legacy loop."
+        ))
@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.moderation import get_moderator
+
+
+SAMPLES = [
+    "Hi, how are you? I liked your profile very much.",
+    "My family is from Patna, we can talk to our parents this weekend.",
+    "What do you do for work? I am a software engineer in Bengaluru.",
+    "call me on 98765 43210",
+    "my number is nine eight seven six five four three two one zero",
+    "whatsapp +91-9876-543-210 ok",
+    "you are a f u c k i n g idiot",
+    "sh1t, that is a classic assessment mistake",
+    "pin code 800001, near the station",
+]
+
+
+class Command(BaseCommand):
+    help = "Time the chat moderation scanner on a synthetic corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        corpus = [rng.choice(SAMPLES) for _ in range(options['messages'])]
+        moderator = get_moderator()  # compile outside the timed loops
+
+        started = time.perf_counter()
+        results = [moderator.scan(text) for text in corpus]
+        single = time.perf_counter() - started
+
+        started = time.perf_counter()
+        moderator.scan_many(corpus)
+        batch = time.perf_counter() - started
+
+        per_message = 1_000_000 / len(corpus)
+        self.stdout.write(f"scan:      {single * per_message:.1f} µs/message")
+        self.stdout.write(f"scan_many: {batch * per_message:.1f} µs/message")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(corpus)} messages: {sum(r.abuse for r in results)} abusive, "
+            f"{sum(r.mobile for r in results)} with a mobile number."
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.entitlements import forget_premium
+from accounts.models import PremiumUser
+
+
+class Command(BaseCommand):
+    help = "Turn off is_premium on subscriptions whose expiry_date has passed and drop their cached entitlements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Served by premium_expiry_idx; rows leave the filter once flipped
+        expired = PremiumUser.objects.filter(is_premium=True, expiry_date__lte=timezone.localdate())
+        flipped = 0
+        last_pk = 0
+        while True:
+            rows = list(expired.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'user_id')[:options['chunk_size']])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            with transaction.atomic():
+                flipped += PremiumUser.objects.filter(pk__in=[pk for pk, _ in rows], is_premium=True).update(
+                    is_premium=False, updated=timezone.now()
+                )
+            forget_premium({user_id for _, user_id in rows})
+        self.stdout.write(self.style.SUCCESS(f"Expired {flipped} premium subscriptions."))
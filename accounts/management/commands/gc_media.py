@@ -0,0 +1,123 @@
+import os
+import re
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts.models import MediaBlob, PremiumUser, UploadImage, UserProfile
+
+
+# Every model field that points into MEDIA_ROOT
+REFERENCING_FIELDS = [
+    (UserProfile, ['image', 'identity_proof']),
+    (UploadImage, ['image']),
+    (PremiumUser, ['receipt']),
+    # A blob row keeps its file until its refcount drops to zero
+    (MediaBlob, ['name']),
+]
+SCANNED_DIRS = ['uploads', 'blobs', 'variants']
+UID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+# variants/<original path without extension>_<width>.<ext>
+VARIANT_RE = re.compile(r'^variants/(?P<stem>.+)_\d+\.\w+$')
+
+
+def walk_files(root):
+    """Yield (DirEntry, relative path) for every file below ``root`` without building a full listing."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry, os.path.relpath(entry.path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        except FileNotFoundError:
+            continue
+
+
+def referenced(names):
+    """
+    The subset of ``names`` still referenced by a row. Originals must match a
+    stored path exactly; a variant is kept while its original is referenced.
+    Rows are found by stored path or by the uid every upload is named after.
+    """
+    originals, uids = set(), set()
+    for name in names:
+        match = VARIANT_RE.match(name)
+        original_stem = match.group('stem') if match else None
+        if original_stem is None:
+            originals.add(name)
+        uid = UID_RE.match(os.path.basename(original_stem or name))
+        if uid:
+            uids.add(uid.group(0))
+    stored = set()
+    for model, fields in REFERENCING_FIELDS:
+        condition = Q(uid__in=uids) if hasattr(model, 'uid') else Q(pk__in=[])
+        for field in fields:
+            condition |= Q(**{f'{field}__in': originals})
+        for row in model.objects.filter(condition).values_list(*fields):
+            stored.update(value for value in row if value)
+    stems = {os.path.splitext(value)[0] for value in stored}
+    keep = set()
+    for name in names:
+        match = VARIANT_RE.match(name)
+        if (match.group('stem') in stems) if match else (name in stored):
+            keep.add(name)
+    return keep
+
+
+class Command(BaseCommand):
+    help = "Delete (or quarantine) media files that no database row references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be removed.")
+        parser.add_argument('--quarantine', metavar='DIR', help="Move orphans under DIR instead of deleting them.")
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help="Skip files modified in the last N seconds (uploads not committed yet).")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['min_age']
+        self.totals = {'scanned': 0, 'orphans': 0, 'bytes': 0}
+        batch = []
+        for directory in SCANNED_DIRS:
+            for entry, name in walk_files(os.path.join(settings.MEDIA_ROOT, directory)):
+                self.totals['scanned'] += 1
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > cutoff:
+                    continue
+                batch.append((entry.path, name, stat.st_size))
+                if len(batch) >= options['chunk_size']:
+                    self.collect(batch, options)
+                    batch = []
+        if batch:
+            self.collect(batch, options)
+        verb = "Would reclaim" if options['dry_run'] else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {self.totals['scanned']} files; {verb} {self.totals['orphans']} orphans, "
+            f"{self.totals['bytes']} bytes ({self.totals['bytes'] / (1024 * 1024):.1f} MB)."
+        ))
+
+    def collect(self, batch, options):
+        keep = referenced([name for _, name, _ in batch])
+        for path, name, size in batch:
+            if name in keep:
+                continue
+            self.totals['orphans'] += 1
+            self.totals['bytes'] += size
+            if options['dry_run']:
+                self.stdout.write(f"orphan: {name} ({size} bytes)")
+            elif options['quarantine']:
+                target = os.path.join(options['quarantine'], name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from accounts.chat import PREVIEW_LENGTH, reconcile_members
+from accounts.models import ChatMessage, Conversation, ConversationMember
+
+
+class Command(BaseCommand):
+    help = "Rebuild Conversation and ConversationMember rows from ChatMessage history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # One aggregate row per (sender, receiver) direction, merged into unordered pairs
+        pairs = {}
+        directions = (
+            ChatMessage.objects
+            .filter(sender__isnull=False, receiver__isnull=False)
+            .values('sender_id', 'receiver_id')
+            .annotate(last_id=Max('id'))
+            .order_by()
+        )
+        for row in directions.iterator():
+            sender, receiver = row['sender_id'], row['receiver_id']
+            key = (min(sender, receiver), max(sender, receiver))
+            pairs[key] = max(pairs.get(key, 0), row['last_id'])
+
+        items = list(pairs.items())
+        chunk_size = options['chunk_size']
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            last_messages = ChatMessage.objects.in_bulk([last_id for _, last_id in chunk])
+            with transaction.atomic():
+                conversations = [
+                    self._rebuild_pair(low, high, last_messages[last_id]) for (low, high), last_id in chunk
+                ]
+            # Unread counts follow from each member's (preserved) read watermark
+            reconcile_members(ConversationMember.objects.filter(conversation__in=conversations))
+            self.stdout.write(f"Rebuilt {min(start + chunk_size, len(items))} conversations...")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(items)} conversations."))
+
+    def _rebuild_pair(self, low, high, last_message):
+        conversation, _ = Conversation.objects.update_or_create(
+            user_low_id=low,
+            user_high_id=high,
+            defaults={
+                'last_message': last_message,
+                'last_message_preview': last_message.message[:PREVIEW_LENGTH],
+                'last_message_at': last_message.timestamp,
+            },
+        )
+        for user_id, peer_id in ((low, high), (high, low)):
+            ConversationMember.objects.update_or_create(
+                conversation=conversation,
+                user_id=user_id,
+                defaults={
+                    'peer_id': peer_id,
+                    'last_message_at': last_message.timestamp,
+                },
+            )
+        return conversation
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.facets import FACET_FIELDS, build_labels, forget_facets, get_facet_counts
+from accounts.models import UserProfile
+from accounts.search import normalize
+
+
+class Command(BaseCommand):
+    help = "Rebuild the feed dropdown labels and facet counters. Run hourly, e.g. from cron."
+
+    def handle(self, *args, **options):
+        labels = sum(len(build_labels(field)) for field in FACET_FIELDS)
+        forget_facets()
+        scopes = [''] + [normalize(value) for value, _ in UserProfile.GENDER_CHOICES]
+        for scope in scopes:
+            get_facet_counts(scope)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {labels} labels and facet counts for {len(scopes)} scopes."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import ProfileSearch, UserProfile
+from accounts.search import build_search_entry
+
+
+class Command(BaseCommand):
+    help = "Backfill the ProfileSearch table from UserProfile."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_pk = 0
+        total = 0
+        while True:
+            profiles = list(
+                UserProfile.objects.select_related('user')
+                .filter(pk__gt=last_pk)
+                .order_by('pk')[:chunk_size]
+            )
+            if not profiles:
+                break
+            entries = [build_search_entry(profile) for profile in profiles]
+            with transaction.atomic():
+                ProfileSearch.objects.filter(profile_id__in=[p.pk for p in profiles]).delete()
+                ProfileSearch.objects.bulk_create(entries)
+            last_pk = profiles[-1].pk
+            total += len(profiles)
+            self.stdout.write(f"Indexed {total} profiles...")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search entries for {total} profiles."))
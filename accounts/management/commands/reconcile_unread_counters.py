@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounts.chat import reconcile_members
+from accounts.models import ConversationMember
+
+
+class Command(BaseCommand):
+    help = "Recompute ConversationMember unread counts from read watermarks and reset cached counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed = 0
+        last_pk = 0
+        while True:
+            stale, members = reconcile_members(
+                ConversationMember.objects.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]
+            )
+            if not members:
+                break
+            fixed += stale
+            last_pk = members[-1].pk
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} unread counters."))
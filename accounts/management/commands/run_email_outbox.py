@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import OutboxWorkerPool, drain
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the EmailOutbox table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--poll-interval', type=float, default=5.0)
+        parser.add_argument('--once', action='store_true', help="Drain what is due and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent = drain(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails."))
+            return
+        pool = OutboxWorkerPool(options['workers'], options['batch_size'], options['poll_interval'])
+        pool.start()
+        self.stdout.write(f"Email outbox running with {options['workers']} workers. Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pool.stop()
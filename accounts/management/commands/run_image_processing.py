@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.processing import ImageWorkerPool, process_pending
+
+
+class Command(BaseCommand):
+    help = "Compress raw profile, gallery and receipt uploads that are waiting in the 'processing' state."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--once', action='store_true', help="Process what is waiting and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            done = process_pending(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Processed {done} images."))
+            return
+        pool = ImageWorkerPool(options['workers'], options['batch_size'], options['poll_interval'])
+        pool.start()
+        self.stdout.write(f"Image processing running with {options['workers']} workers. Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pool.stop()
@@ -0,0 +1,119 @@
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.images import VARIANT_FORMATS, VARIANT_WIDTHS, variant_name
+from accounts.models import PremiumUser, UploadImage, UserProfile
+
+
+# (model, file field, processing-state field); raw uploads still being processed are left alone
+SHARDED_FIELDS = [
+    (UserProfile, 'image', 'image_state'),
+    (UserProfile, 'identity_proof', None),
+    (UploadImage, 'image', 'image_state'),
+    (PremiumUser, 'receipt', 'receipt_state'),
+]
+
+
+def digest(storage, name):
+    hasher = hashlib.blake2b()
+    with storage.open(name, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(64 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
+def move(storage, old_name, new_name):
+    """
+    Move a stored file; a rename on local disk, copy + delete elsewhere. If
+    ``new_name`` already holds the same bytes (an interrupted earlier run) it
+    is reused and the old copy dropped; a different file there is never
+    overwritten. Returns the name the file ended up under.
+    """
+    if storage.exists(new_name):
+        if digest(storage, old_name) == digest(storage, new_name):
+            storage.delete(old_name)
+            return new_name
+        new_name = storage.get_available_name(new_name)
+    try:
+        old_path, new_path = storage.path(old_name), storage.path(new_name)
+    except NotImplementedError:
+        with storage.open(old_name, 'rb') as source:
+            new_name = storage.save(new_name, File(source))
+        storage.delete(old_name)
+        return new_name
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    os.replace(old_path, new_path)
+    return new_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Move media files from the flat per-type directories into the hash-sharded "
+        "ab/cd/<uid>.<ext> layout and rewrite the stored paths. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        for model, field_name, state_field in SHARDED_FIELDS:
+            moved, missing = self.shard(model, field_name, state_field, options['chunk_size'], options['dry_run'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}.{field_name}: moved {moved}, missing on disk {missing}."
+            ))
+
+    def shard(self, model, field_name, state_field, chunk_size, dry_run):
+        field = model._meta.get_field(field_name)
+        queryset = (
+            model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            # Shared content-addressed blobs are already sharded by digest
+            .exclude(**{f'{field_name}__startswith': 'blobs/'})
+        )
+        if state_field:
+            queryset = queryset.exclude(**{state_field: 'processing'})
+        moved = missing = 0
+        last_pk = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_pk).only('pk', 'uid', field_name).order_by('pk')[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            changed = []
+            for row in rows:
+                field_file = getattr(row, field_name)
+                old_name = field_file.name
+                new_name = field.generate_filename(row, os.path.basename(old_name))
+                if old_name == new_name:
+                    continue
+                storage = field_file.storage
+                if storage.exists(old_name):
+                    if dry_run:
+                        moved += 1
+                        continue
+                    new_name = move(storage, old_name, new_name)
+                    self.move_variants(storage, old_name, new_name)
+                elif not storage.exists(new_name):
+                    # Neither copy exists; nothing to move
+                    missing += 1
+                    continue
+                # else: moved by an interrupted earlier run, only the path needs rewriting
+                setattr(row, field_name, new_name)
+                changed.append(row)
+            if changed:
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, [field_name])
+                moved += len(changed)
+            self.stdout.write(f"{model.__name__}.{field_name}: through pk {last_pk}...")
+        return moved, missing
+
+    def move_variants(self, storage, old_name, new_name):
+        for width in VARIANT_WIDTHS:
+            for ext, _ in VARIANT_FORMATS:
+                old_variant = variant_name(old_name, width, ext)
+                if storage.exists(old_variant):
+                    move(storage, old_variant, variant_name(new_name, width, ext))
@@ -0,0 +1,80 @@
+"""
+Mutual-interest matches.
+
+When A sends an interest to B, the reverse pair (sender=B, receiver=A's
+profile) is looked up on the (sender, receiver) unique index; if B already
+sent one, the pair becomes a match. A match is stored as two directed Match
+rows, one per side, so each user's match list is a single range scan on
+match_user_recent_idx instead of a self-join over ProfileInterest.
+
+Detection runs after the sending transaction commits. If A and B send at the
+same moment, both checks may see both interests and race to insert the same
+two Match rows with ignore_conflicts, each winning one. Only the request that
+inserted the pair's canonical row (the one owned by the smaller user id)
+notifies, so each side gets exactly one email.
+"""
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Match, ProfileInterest, UserProfile
+from .outbox import enqueue_many
+from .utils import build_match_email
+
+
+def _canonical(sender, sender_profile, profile):
+    """The (user_id, profile_id) Match row that decides who notifies for this pair."""
+    if sender.id < profile.user_id:
+        return sender.id, profile.id
+    return profile.user_id, sender_profile.id
+
+
+def record_matches(sender, receiver_profiles):
+    """
+    Match ``sender`` with every profile in ``receiver_profiles`` whose owner
+    already sent ``sender`` an interest. Both interests are marked accepted and
+    both sides are emailed. Returns the newly matched profiles.
+    """
+    sender_profile = UserProfile.objects.filter(user=sender).select_related('user').first()
+    if sender_profile is None or not receiver_profiles:
+        return []
+    by_user = {profile.user_id: profile for profile in receiver_profiles}
+    # Reverse-pair lookup: equality on receiver plus an IN list on sender, both in the unique index
+    mutual = list(
+        ProfileInterest.objects.filter(sender_id__in=by_user, receiver=sender_profile)
+        .values_list('sender_id', flat=True)
+    )
+    if not mutual:
+        return []
+    rows = []
+    for user_id in mutual:
+        rows.append(Match(user=sender, profile=by_user[user_id]))
+        rows.append(Match(user_id=user_id, profile=sender_profile))
+    with transaction.atomic():
+        Match.objects.bulk_create(rows, ignore_conflicts=True)
+        # Only rows carrying our uids were inserted by this call
+        inserted = set(Match.objects.filter(uid__in=[row.uid for row in rows]).values_list('user_id', 'profile_id'))
+        matched = [
+            by_user[user_id] for user_id in mutual
+            if _canonical(sender, sender_profile, by_user[user_id]) in inserted
+        ]
+        if not matched:
+            return []
+        matched_users = [profile.user_id for profile in matched]
+        ProfileInterest.objects.filter(
+            Q(sender=sender, receiver__in=matched) | Q(sender_id__in=matched_users, receiver=sender_profile)
+        ).update(status='accepted')
+        emails = []
+        for profile in matched:
+            emails.append(build_match_email(sender, profile))
+            emails.append(build_match_email(profile.user, sender_profile))
+        enqueue_many(emails)
+    return matched
+
+
+def my_matches(user):
+    """Profiles ``user`` has matched with, newest first, in one indexed query."""
+    return (
+        Match.objects.filter(user=user)
+        .select_related('profile__user')
+        .order_by('-created_at')
+    )
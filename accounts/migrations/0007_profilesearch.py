@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_profile_search(apps, schema_editor):
+    """Index every existing profile so the feed is populated as soon as this migration runs."""
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    ProfileSearch = apps.get_model('accounts', 'ProfileSearch')
+    lengths = {field.name: field.max_length for field in ProfileSearch._meta.fields if field.max_length}
+    last_pk = 0
+    while True:
+        profiles = list(UserProfile.objects.select_related('user').filter(pk__gt=last_pk).order_by('pk')[:1000])
+        if not profiles:
+            break
+        entries = []
+        for profile in profiles:
+            entry = ProfileSearch(
+                profile_id=profile.pk,
+                user_id=profile.user_id,
+                is_verified=profile.user.is_verified,
+                dob=profile.dob,
+                created_at=profile.created_at,
+            )
+            for field in ['gender', 'caste', 'religion', 'country', 'state', 'city']:
+                # Same normalization as accounts.search.normalize: casefolded, whitespace collapsed
+                value = ' '.join(str(getattr(profile, field) or '').split()).casefold()
+                setattr(entry, field, value[:lengths[field]])
+            entries.append(entry)
+        ProfileSearch.objects.bulk_create(entries)
+        last_pk = profiles[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_alter_chatmessage_receiver_alter_chatmessage_sender'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_verified', models.BooleanField(default=False)),
+                ('gender', models.CharField(blank=True, default='', max_length=10)),
+                ('dob', models.DateField(blank=True, null=True)),
+                ('caste', models.CharField(blank=True, default='', max_length=100)),
+                ('religion', models.CharField(blank=True, default='', max_length=50)),
+                ('country', models.CharField(blank=True, default='', max_length=100)),
+                ('state', models.CharField(blank=True, default='', max_length=100)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('created_at', models.DateTimeField()),
+                ('profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_entry', to='accounts.userprofile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_verified', 'gender', 'dob'], name='search_gender_dob_idx'), models.Index(fields=['is_verified', 'gender', 'caste', 'dob'], name='search_gender_caste_idx'), models.Index(fields=['is_verified', 'gender', 'religion', 'dob'], name='search_gender_religion_idx'), models.Index(fields=['is_verified', 'gender', 'country', 'state', 'city'], name='search_gender_location_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_profile_search, migrations.RunPython.noop),
+    ]
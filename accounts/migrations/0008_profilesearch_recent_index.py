@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_profilesearch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profilesearch',
+            index=models.Index(fields=['is_verified', 'gender', 'created_at', 'id'], name='search_gender_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_read_watermarks(apps, schema_editor):
+    """Turn the per-row seen flags into a read watermark per conversation participant."""
+    ChatMessage = apps.get_model('accounts', 'ChatMessage')
+    Conversation = apps.get_model('accounts', 'Conversation')
+    ConversationMember = apps.get_model('accounts', 'ConversationMember')
+    last_seen = (
+        ChatMessage.objects
+        .filter(seen=True, sender__isnull=False, receiver__isnull=False)
+        .values('sender_id', 'receiver_id')
+        .annotate(last_id=models.Max('id'))
+        .order_by()
+    )
+    for row in last_seen.iterator():
+        reader, peer = row['receiver_id'], row['sender_id']
+        low, high = min(reader, peer), max(reader, peer)
+        conversation, created = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+        if created:
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=low, peer_id=high),
+                ConversationMember(conversation=conversation, user_id=high, peer_id=low),
+            ])
+        ConversationMember.objects.filter(conversation=conversation, user_id=reader).update(
+            last_read_message_id=row['last_id']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_chatmessage_pair_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationmember',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.chatmessage'),
+        ),
+        migrations.RunPython(seed_read_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='seen',
+        ),
+    ]
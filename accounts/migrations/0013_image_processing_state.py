@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_read_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='premiumuser',
+            name='receipt_state',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='uploadimage',
+            name='image_state',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='image_state',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_image_dhash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premiumuser',
+            index=models.Index(fields=['is_premium', 'expiry_date'], name='premium_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_premium_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profileinterest',
+            index=models.Index(fields=['sender', 'created_at'], name='interest_sender_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_match'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='conversationmember',
+            name='member_inbox_idx',
+        ),
+        migrations.AddIndex(
+            model_name='conversationmember',
+            index=models.Index(fields=['user', '-last_message_at', '-id'], name='member_inbox_idx'),
+        ),
+    ]
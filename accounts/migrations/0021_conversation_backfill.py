@@ -0,0 +1,85 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:24
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+CHUNK_SIZE = 500
+PREVIEW_LENGTH = 255
+
+
+def backfill_conversations(apps, schema_editor):
+    """Build Conversation/ConversationMember rows for chat history sent before they existed."""
+    ChatMessage = apps.get_model('accounts', 'ChatMessage')
+    Conversation = apps.get_model('accounts', 'Conversation')
+    ConversationMember = apps.get_model('accounts', 'ConversationMember')
+    # One aggregate row per (sender, receiver) direction, merged into unordered pairs
+    pairs = {}
+    directions = (
+        ChatMessage.objects
+        .filter(sender__isnull=False, receiver__isnull=False)
+        .values('sender_id', 'receiver_id')
+        .annotate(last_id=models.Max('id'))
+        .order_by()
+    )
+    for row in directions.iterator():
+        sender, receiver = row['sender_id'], row['receiver_id']
+        key = (min(sender, receiver), max(sender, receiver))
+        pairs[key] = max(pairs.get(key, 0), row['last_id'])
+
+    items = list(pairs.items())
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = items[start:start + CHUNK_SIZE]
+        last_messages = ChatMessage.objects.in_bulk([last_id for _, last_id in chunk])
+        conversations = []
+        for (low, high), last_id in chunk:
+            last_message = last_messages[last_id]
+            conversation, _ = Conversation.objects.update_or_create(
+                user_low_id=low,
+                user_high_id=high,
+                defaults={
+                    'last_message': last_message,
+                    'last_message_preview': last_message.message[:PREVIEW_LENGTH],
+                    'last_message_at': last_message.timestamp,
+                },
+            )
+            conversations.append(conversation)
+            for user_id, peer_id in ((low, high), (high, low)):
+                ConversationMember.objects.update_or_create(
+                    conversation=conversation,
+                    user_id=user_id,
+                    defaults={'peer_id': peer_id, 'last_message_at': last_message.timestamp},
+                )
+        # Unread counts follow from each member's read watermark (seeded in 0012)
+        members = ConversationMember.objects.filter(conversation__in=conversations).annotate(
+            actual_unread=Coalesce(
+                models.Subquery(
+                    ChatMessage.objects.filter(
+                        sender=models.OuterRef('peer_id'),
+                        receiver=models.OuterRef('user_id'),
+                        id__gt=Coalesce(models.OuterRef('last_read_message_id'), 0),
+                    )
+                    .order_by()
+                    .values('receiver')
+                    .annotate(total=models.Count('id'))
+                    .values('total')
+                ),
+                0,
+            )
+        )
+        stale = []
+        for member in members:
+            if member.unread_count != member.actual_unread:
+                member.unread_count = member.actual_unread
+                stale.append(member)
+        ConversationMember.objects.bulk_update(stale, ['unread_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_member_inbox_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_conversation_backfill'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='premiumuser',
+            name='receipt_state',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='uploadimage',
+            name='image_state',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', editable=False, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='image_state',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', editable=False, max_length=20),
+        ),
+    ]
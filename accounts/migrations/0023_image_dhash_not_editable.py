@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_image_state_not_editable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadimage',
+            name='image_dhash',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='userprofile',
+            name='image_dhash',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -1,24 +1,38 @@
 from django.utils import timezone
 import os, uuid, random, string
-from django.db import models
+import hashlib
+from django.db import models, transaction
 from django.conf import settings
 from django.core import validators
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils.translation import gettext_lazy as _
-import uuid
-import io
-from PIL import Image
-from django.core.files.base import ContentFile
-from django.core.exceptions import ValidationError
 from datetime import date
 from django.utils.timezone import now
-from django.core.exceptions import ValidationError
-from PIL import Image
-import uuid
-
-
-
-class UserAccountManager(BaseUserManager):
+from .images import compress_image
+from .uploads import is_pdf
+
+
+
+class UserAccountQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Bulk updates bypass save(), so carry is_verified changes over to ProfileSearch here."""
+        if 'is_verified' not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            user_ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            ProfileSearch.objects.filter(user_id__in=user_ids).update(
+                is_verified=models.Subquery(
+                    UserAccount.objects.filter(pk=models.OuterRef('user_id')).values('is_verified')[:1]
+                )
+            )
+        # Per-row facet counters were skipped; let the feed rebuild them
+        from .facets import forget_facets
+        transaction.on_commit(forget_facets, using=self.db)
+        return rows
+
+
+class UserAccountManager(BaseUserManager.from_queryset(UserAccountQuerySet)):
     def create_user(self, email, password=None, **kwargs):
         if not email:
             raise ValueError('Users must have a valid email address.')
@@ -80,20 +94,27 @@ def key_generator(size=10, prefix="VIVAH"):
     suffix = ''.join(random.SystemRandom().choice(string.digits) for _ in range(suffix_size))
     return f"{prefix}{suffix}"
 
-def user_profile_image_upload_path(instance, filename):
+# Uploads are stored raw as 'processing' and compressed by run_image_processing
+IMAGE_STATE_CHOICES = [
+    ('processing', 'Processing'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+]
+
+def sharded_upload_path(directory, instance, filename):
+    """<directory>/ab/cd/<uid>.<ext>, where ab/cd are the first hex digits of md5(uid)."""
     ext = filename.split('.')[-1]
-    filename = f"{instance.uid}.{ext}"
-    return os.path.join('uploads/user_profile/images/', filename)
+    digest = hashlib.md5(str(instance.uid).encode()).hexdigest()
+    return os.path.join(directory, digest[:2], digest[2:4], f"{instance.uid}.{ext}")
+
+def user_profile_image_upload_path(instance, filename):
+    return sharded_upload_path('uploads/user_profile/images/', instance, filename)
 
 def user_profile_identity_upload_path(instance, filename):
-    ext = filename.split('.')[-1]
-    filename = f"{instance.uid}.{ext}"
-    return os.path.join('uploads/identity/images/', filename)
+    return sharded_upload_path('uploads/identity/images/', instance, filename)
 
 def user_profile_galary_image_upload_path(instance, filename):
-    ext = filename.split('.')[-1]
-    filename = f"{instance.uid}.{ext}"
-    return os.path.join('uploads/user_galary/images/', filename)
+    return sharded_upload_path('uploads/user_galary/images/', instance, filename)
 
 class UserProfile(models.Model):
     GENDER_CHOICES = [
@@ -417,6 +438,9 @@ class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="profile")
     post_by = models.CharField(max_length=100, choices=POST_BY_CHOICES, null=True, blank=True)
     image = models.ImageField(upload_to=user_profile_image_upload_path, null=True, blank=True)
+    image_state = models.CharField(max_length=20, choices=IMAGE_STATE_CHOICES, default='ready', db_index=True, editable=False)
+    # 64-bit dHash of the processed image, stored signed; see accounts/similarity.py
+    image_dhash = models.BigIntegerField(null=True, blank=True, db_index=True, editable=False)
     user_identity = models.CharField(db_index=True, unique=True, max_length=10, default=key_generator, editable=False)
     # Personal Info
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
@@ -475,47 +499,29 @@ class UserProfile(models.Model):
         return None
 
     def save(self, *args, **kwargs):
-        if self.pk:  # update case only
-            try:
-                old_instance = UserProfile.objects.get(pk=self.pk)
-                # Delete old profile image if replaced
-                if old_instance.image and old_instance.image != self.image:
-                    if os.path.exists(old_instance.image.path):
-                        os.remove(old_instance.image.path)
-                # Delete old identity proof if replaced
-                if old_instance.identity_proof and old_instance.identity_proof != self.identity_proof:
-                    if os.path.exists(old_instance.identity_proof.path):
-                        os.remove(old_instance.identity_proof.path)
-            except UserProfile.DoesNotExist:
-                pass  # new instance
-        # Save normally first if new file not yet saved
-        if self.image:
-            self.image = self.compress_image(self.image)
-        super().save(*args, **kwargs)
+        from .blobs import adopt_processed, intern_upload, release
+        # Blob references move with the row: a failed save rolls them back and keeps the files
+        with transaction.atomic():
+            if self.pk:  # update case only
+                try:
+                    old_instance = UserProfile.objects.get(pk=self.pk)
+                    adopt_processed(self, old_instance, 'image')
+                    # Delete old profile image if replaced
+                    if old_instance.image and old_instance.image != self.image:
+                        release(old_instance.image)
+                    # Delete old identity proof if replaced
+                    if old_instance.identity_proof and old_instance.identity_proof != self.identity_proof:
+                        release(old_instance.identity_proof)
+                except UserProfile.DoesNotExist:
+                    pass  # new instance
+            # Only freshly uploaded files need compressing; stored ones already are
+            if self.image and not self.image._committed:
+                intern_upload(self, 'image', self.compress_image)
+            super().save(*args, **kwargs)
 
     def compress_image(self, uploaded_image):
         """Compress uploaded image to under 200 KB and standard size."""
-        image_temp = Image.open(uploaded_image)
-        image_format = image_temp.format  # e.g., JPEG, PNG
-        # Convert all images to RGB (for JPEG)
-        if image_temp.mode in ("RGBA", "P"):
-            image_temp = image_temp.convert("RGB")
-        # Resize to standard size (maintain aspect ratio)
-        image_temp.thumbnail((self.STANDARD_WIDTH, self.STANDARD_HEIGHT))
-        # Compress until under 200 KB
-        buffer = io.BytesIO()
-        quality = 85  # start quality
-        image_temp.save(buffer, format='JPEG', quality=quality, optimize=True)
-        while buffer.tell() > self.MAX_IMAGE_SIZE_KB * 1024 and quality > 30:
-            buffer = io.BytesIO()
-            quality -= 5
-            image_temp.save(buffer, format='JPEG', quality=quality, optimize=True)
-        if buffer.tell() > self.MAX_IMAGE_SIZE_KB * 1024:
-            raise ValidationError("Image cannot be compressed below 200 KB. Please upload a smaller image.")
-        # Create new Django file
-        compressed_image = ContentFile(buffer.getvalue())
-        new_filename = f"{uuid.uuid4()}.jpg"
-        return ContentFile(buffer.getvalue(), name=new_filename)
+        return compress_image(uploaded_image, self.MAX_IMAGE_SIZE_KB, (self.STANDARD_WIDTH, self.STANDARD_HEIGHT))
 
     class Meta:
         verbose_name = 'User Profile'
@@ -526,6 +532,9 @@ class UploadImage(models.Model):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     galary = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='gallery_image', blank=True, null=True,)
     image = models.ImageField(upload_to=user_profile_galary_image_upload_path, null=True, blank=True)
+    image_state = models.CharField(max_length=20, choices=IMAGE_STATE_CHOICES, default='ready', db_index=True, editable=False)
+    # 64-bit dHash of the processed image, stored signed; see accounts/similarity.py
+    image_dhash = models.BigIntegerField(null=True, blank=True, db_index=True, editable=False)
     created = models.DateTimeField(auto_now_add=True, db_index=True)
     updated = models.DateTimeField(auto_now=True)
     
@@ -537,42 +546,24 @@ class UploadImage(models.Model):
         return str(self.uid)
 
     def save(self, *args, **kwargs):
-        if self.pk:  # check if this is an update
-            try:
-                old_instance = UploadImage.objects.get(pk=self.pk)
-                if old_instance.image and old_instance.image != self.image:
-                    if os.path.exists(old_instance.image.path):
-                        os.remove(old_instance.image.path)
-            except UploadImage.DoesNotExist:
-                pass  # new object, no old image to delete
-        # Save normally first if new file not yet saved
-        if self.image:
-            self.image = self.compress_image(self.image)
-        super().save(*args, **kwargs)
+        from .blobs import adopt_processed, intern_upload, release
+        with transaction.atomic():
+            if self.pk:  # check if this is an update
+                try:
+                    old_instance = UploadImage.objects.get(pk=self.pk)
+                    adopt_processed(self, old_instance, 'image')
+                    if old_instance.image and old_instance.image != self.image:
+                        release(old_instance.image)
+                except UploadImage.DoesNotExist:
+                    pass  # new object, no old image to delete
+            # Only freshly uploaded files need compressing; stored ones already are
+            if self.image and not self.image._committed:
+                intern_upload(self, 'image', self.compress_image)
+            super().save(*args, **kwargs)
 
     def compress_image(self, uploaded_image):
         """Compress uploaded image to under 200 KB and standard size."""
-        image_temp = Image.open(uploaded_image)
-        image_format = image_temp.format  # e.g., JPEG, PNG
-        # Convert all images to RGB (for JPEG)
-        if image_temp.mode in ("RGBA", "P"):
-            image_temp = image_temp.convert("RGB")
-        # Resize to standard size (maintain aspect ratio)
-        image_temp.thumbnail((self.STANDARD_WIDTH, self.STANDARD_HEIGHT))
-        # Compress until under 200 KB
-        buffer = io.BytesIO()
-        quality = 85  # start quality
-        image_temp.save(buffer, format='JPEG', quality=quality, optimize=True)
-        while buffer.tell() > self.MAX_IMAGE_SIZE_KB * 1024 and quality > 30:
-            buffer = io.BytesIO()
-            quality -= 5
-            image_temp.save(buffer, format='JPEG', quality=quality, optimize=True)
-        if buffer.tell() > self.MAX_IMAGE_SIZE_KB * 1024:
-            raise ValidationError("Image cannot be compressed below 200 KB. Please upload a smaller image.")
-        # Create new Django file
-        compressed_image = ContentFile(buffer.getvalue())
-        new_filename = f"{uuid.uuid4()}.jpg"
-        return ContentFile(buffer.getvalue(), name=new_filename)
+        return compress_image(uploaded_image, self.MAX_IMAGE_SIZE_KB, (self.STANDARD_WIDTH, self.STANDARD_HEIGHT))
 
 
 class ProfileInterest(models.Model):
@@ -603,12 +594,51 @@ class ProfileInterest(models.Model):
     class Meta:
         unique_together = ('sender', 'receiver')  # Prevent duplicate interests
         ordering = ['-created_at']  # Most recent first
+        indexes = [
+            # Today's interests per sender, for seeding the daily quota counter
+            models.Index(fields=['sender', 'created_at'], name='interest_sender_created_idx'),
+        ]
 
     def __str__(self):
         receiver_username = self.receiver.user.username if self.receiver and self.receiver.user else "Anonymous"
         return f"{self.sender.username} → {receiver_username}"
 
 
+class Match(models.Model):
+    """
+    A mutual interest, stored once per side: ``user`` matched with ``profile``.
+    "My matches" is then a plain range scan on match_user_recent_idx.
+    """
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user = models.ForeignKey(UserAccount, on_delete=models.CASCADE, related_name='matches')
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'profile')
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='match_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} ♥ {self.profile.user.username}"
+
+
+class Shortlist(models.Model):
+    """Profiles a user has saved to send interests to later, in bulk."""
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user = models.ForeignKey(UserAccount, on_delete=models.CASCADE, related_name='shortlist')
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='shortlisted_by')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'profile')
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user.username} ☆ {self.profile.user.username}"
+
+
 class UserOtp(models.Model):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
@@ -691,17 +721,17 @@ class ChatMessage(models.Model):
         related_name='received_messages', null=True, blank=True
     )
     message = models.TextField()
-    seen = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['sender', 'receiver', 'timestamp'], name='chat_pair_timestamp_idx'),
+        ]
 
 
 def user_premium_upload_path(instance, filename):
-    ext = filename.split('.')[-1]
-    filename = f"{instance.uid}.{ext}"
-    return os.path.join('uploads', 'premium', filename)
+    return sharded_upload_path(os.path.join('uploads', 'premium'), instance, filename)
 
 class PremiumUser(models.Model):
     PAYMENT_STATUS_CHOICES = [
@@ -728,6 +758,7 @@ class PremiumUser(models.Model):
         default='pending'
     )
     receipt = models.FileField(upload_to=user_premium_upload_path, null=True, blank=True)
+    receipt_state = models.CharField(max_length=20, choices=IMAGE_STATE_CHOICES, default='ready', db_index=True, editable=False)
     expiry_date = models.DateField(null=True, blank=True)
     created = models.DateTimeField(default=now)
     updated = models.DateTimeField(auto_now=True)
@@ -740,39 +771,158 @@ class PremiumUser(models.Model):
         return f"{self.user.username} - {'Premium' if self.is_premium else 'Standard'}"
 
     def save(self, *args, **kwargs):
-        if self.pk:  # check if this is an update
-            try:
-                old_instance = PremiumUser.objects.get(pk=self.pk)
-                if old_instance.receipt and old_instance.receipt != self.receipt:
-                    if os.path.exists(old_instance.receipt.path):
-                        os.remove(old_instance.receipt.path)
-            except UserProfile.DoesNotExist:
-                pass  # new object, no old image to delete
-        # Save normally first if new file not yet saved
-        if self.receipt:
-            self.receipt = self.compress_receipt(self.receipt)
-        super().save(*args, **kwargs)
+        from .blobs import adopt_processed, intern_upload, release
+        with transaction.atomic():
+            if self.pk:  # check if this is an update
+                try:
+                    old_instance = PremiumUser.objects.get(pk=self.pk)
+                    adopt_processed(self, old_instance, 'receipt')
+                    if old_instance.receipt and old_instance.receipt != self.receipt:
+                        release(old_instance.receipt)
+                except PremiumUser.DoesNotExist:
+                    pass  # new object, no old image to delete
+            # Only freshly uploaded files need compressing; stored ones already are
+            if self.receipt and not self.receipt._committed:
+                if is_pdf(self.receipt):
+                    # PDF receipts are stored as uploaded; the JPEG compressor can't read them
+                    self.receipt_state = 'ready'
+                else:
+                    intern_upload(self, 'receipt', self.compress_receipt, variants=False)
+            super().save(*args, **kwargs)
 
     def compress_receipt(self, uploaded_image):
         """Compress uploaded image to under 200 KB and standard size."""
-        image_temp = Image.open(uploaded_image)
-        image_format = image_temp.format  # e.g., JPEG, PNG
-        # Convert all images to RGB (for JPEG)
-        if image_temp.mode in ("RGBA", "P"):
-            image_temp = image_temp.convert("RGB")
-        # Resize to standard size (maintain aspect ratio)
-        image_temp.thumbnail((self.STANDARD_WIDTH, self.STANDARD_HEIGHT))
-        # Compress until under 200 KB
-        buffer = io.BytesIO()
-        quality = 85  # start quality
-        image_temp.save(buffer, format='JPEG', quality=quality, optimize=True)
-        while buffer.tell() > self.MAX_IMAGE_SIZE_KB * 1024 and quality > 30:
-            buffer = io.BytesIO()
-            quality -= 5
-            image_temp.save(buffer, format='JPEG', quality=quality, optimize=True)
-        if buffer.tell() > self.MAX_IMAGE_SIZE_KB * 1024:
-            raise ValidationError("Image cannot be compressed below 200 KB. Please upload a smaller image.")
-        # Create new Django file
-        compressed_image = ContentFile(buffer.getvalue())
-        new_filename = f"{uuid.uuid4()}.jpg"
-        return ContentFile(buffer.getvalue(), name=new_filename)
+        return compress_image(uploaded_image, self.MAX_IMAGE_SIZE_KB, (self.STANDARD_WIDTH, self.STANDARD_HEIGHT))
+
+    class Meta:
+        indexes = [
+            # expire_premium sweeps by these; per-user lookups use the user FK index
+            models.Index(fields=['is_premium', 'expiry_date'], name='premium_expiry_idx'),
+        ]
+
+
+class ProfileSearch(models.Model):
+    """Narrow, normalized copy of UserProfile used by the profile feed filters."""
+    profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, related_name='search_entry')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    is_verified = models.BooleanField(default=False)
+    gender = models.CharField(max_length=10, blank=True, default='')
+    dob = models.DateField(null=True, blank=True)
+    caste = models.CharField(max_length=100, blank=True, default='')
+    religion = models.CharField(max_length=50, blank=True, default='')
+    # Kept at 100 so search_gender_location_idx stays under InnoDB's 3072-byte key limit in utf8mb4
+    country = models.CharField(max_length=100, blank=True, default='')
+    state = models.CharField(max_length=100, blank=True, default='')
+    city = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_verified', 'gender', 'created_at', 'id'], name='search_gender_recent_idx'),
+            models.Index(fields=['is_verified', 'gender', 'dob'], name='search_gender_dob_idx'),
+            models.Index(fields=['is_verified', 'gender', 'caste', 'dob'], name='search_gender_caste_idx'),
+            models.Index(fields=['is_verified', 'gender', 'religion', 'dob'], name='search_gender_religion_idx'),
+            models.Index(fields=['is_verified', 'gender', 'country', 'state', 'city'], name='search_gender_location_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.profile_id)
+
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255)
+    to = models.TextField(help_text="Comma separated recipient addresses")
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When pending: earliest retry time. When sending: lease expiry, after which
+    # another worker may reclaim the row (e.g. the first one crashed).
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {self.to} ({self.status})"
+
+
+class Conversation(models.Model):
+    """One row per pair of users who have chatted; ``user_low`` has the smaller id."""
+    uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    user_low = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    user_high = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    last_message = models.ForeignKey(ChatMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=255, blank=True, default='')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user_low', 'user_high')
+
+    def __str__(self):
+        return f"{self.user_low_id} ↔ {self.user_high_id}"
+
+
+class ConversationMember(models.Model):
+    """A participant's view of a conversation, so the inbox is one indexed query."""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='conversations')
+    peer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    # Everything up to and including this message has been read by ``user``.
+    # Read receipts and unread counts are derived from it; marking a
+    # conversation read is a single-row write however many messages it covers.
+    last_read_message = models.ForeignKey(
+        ChatMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False
+    )
+    unread_count = models.PositiveIntegerField(default=0)  # peer messages newer than last_read_message
+    last_message_at = models.DateTimeField(null=True, blank=True)  # copy of conversation.last_message_at
+
+    class Meta:
+        unique_together = ('conversation', 'user')
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', '-id'], name='member_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → {self.peer_id}"
+
+
+class MediaBlob(models.Model):
+    """
+    A processed image stored once under its content hash. Profile, gallery and
+    receipt fields point at ``name``; ``refcount`` counts those references and
+    the file is deleted when it drops to zero.
+    """
+    digest = models.CharField(max_length=64, unique=True)  # BLAKE2b of the stored bytes
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField()
+    dhash = models.BigIntegerField(null=True, blank=True)  # photos only, copied to the referencing rows
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class MediaSource(models.Model):
+    """Raw upload digest → processed blob, so a repeat upload skips Pillow and storage entirely."""
+    digest = models.CharField(max_length=64, unique=True)  # BLAKE2b of the upload bytes + processing settings
+    blob = models.ForeignKey(MediaBlob, on_delete=models.CASCADE, related_name='sources')
+
+    def __str__(self):
+        return self.digest
@@ -0,0 +1,134 @@
+"""
+In-process chat moderation: abusive terms and (obfuscated) Indian mobile numbers.
+
+Patterns are compiled once per word-list version, so scanning a message is a
+handful of regex passes over a short string with no I/O. The word list is
+re-read when its modification time changes; if it cannot be read, moderation
+falls back to an empty list (mobile numbers are still caught) and logs it.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHECK_SECONDS = 5
+# Separated digit groups a written number may have ("+91 98765 43210", "98 76 54 32 10");
+# more than this only counts when every digit is split the same way ("9 8 7 6 ...")
+MAX_DIGIT_GROUPS = 5
+
+ModerationResult = namedtuple('ModerationResult', ['abuse', 'mobile', 'terms'])
+
+_LEET = str.maketrans({'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '@': 'a', '$': 's', '!': 'i'})
+# Devanagari and full-width digits → ASCII, so "९८७..." is caught too
+_DIGITS = str.maketrans(
+    {chr(0x966 + i): str(i) for i in range(10)} | {chr(0xFF10 + i): str(i) for i in range(10)}
+)
+_NUMBER_WORDS = {
+    'zero': '0', 'oh': '0', 'shunya': '0', 'one': '1', 'ek': '1', 'two': '2', 'do': '2',
+    'three': '3', 'teen': '3', 'four': '4', 'char': '4', 'chaar': '4', 'five': '5',
+    'paanch': '5', 'panch': '5', 'six': '6', 'chhe': '6', 'che': '6', 'seven': '7',
+    'saat': '7', 'eight': '8', 'aath': '8', 'nine': '9', 'nau': '9', 'nao': '9',
+}
+_NUMBER_WORD_RE = re.compile(r'\b(' + '|'.join(sorted(_NUMBER_WORDS, key=len, reverse=True)) + r')\b', re.IGNORECASE)
+_SEP = r'[\s.\-_/()*,+]{0,3}'
+# Optional +91 / 91 / 0 prefix, then 10 digits starting 6-9, allowing short separators between digits.
+# A lookahead so overlapping candidates are all tried; _is_mobile then checks how they are separated.
+_MOBILE_RE = re.compile(rf'(?<!\d)(?=((?:\+?9{_SEP}1{_SEP}|0{_SEP})?[6-9](?:{_SEP}\d){{9}})(?!\d))')
+_REPEATS_RE = re.compile(r'(\w)\1{2,}')
+# Runs of single characters split by separators: "f u c k", "f.u.c.k"
+_SPACED_RE = re.compile(r'\b(?:\w[\W_]{1,3}){2,}\w\b')
+
+
+def _is_mobile(candidate):
+    """
+    Reject digit runs that only look like a number because of loose separators,
+    e.g. "6 7 8 9 10 11 12 pm": the 10 digits must be in a few groups, or all
+    split by the same separator.
+    """
+    gaps = [gap.strip() or ' ' for gap in re.split(r'\d', candidate)[-10:-1] if gap]
+    if len(gaps) < MAX_DIGIT_GROUPS:
+        return True
+    return len(gaps) == 9 and len(set(gaps)) == 1
+
+
+def _normalize_words(text):
+    text = text.casefold().translate(_LEET)
+    text = _REPEATS_RE.sub(r'\1', text)  # "fuuuck" → "fuck"
+    return _SPACED_RE.sub(lambda match: re.sub(r'[\W_]', '', match.group()), text)
+
+
+class Moderator:
+    def __init__(self, terms):
+        self.terms = sorted({_REPEATS_RE.sub(r'\1', term.casefold()) for term in terms if term}, key=len, reverse=True)
+        if self.terms:
+            alternatives = '|'.join(re.escape(term).replace(r'\ ', r'\s+') for term in self.terms)
+            self._abuse_re = re.compile(rf'\b(?:{alternatives})\b')
+        else:
+            self._abuse_re = None
+
+    def scan(self, text):
+        if not text:
+            return ModerationResult(False, False, [])
+        terms = self._abuse_re.findall(_normalize_words(text)) if self._abuse_re else []
+        digits = _NUMBER_WORD_RE.sub(lambda match: _NUMBER_WORDS[match.group().lower()], text.translate(_DIGITS))
+        mobile = any(_is_mobile(match.group(1)) for match in _MOBILE_RE.finditer(digits))
+        return ModerationResult(bool(terms), mobile, terms)
+
+    def scan_many(self, texts):
+        return [self.scan(text) for text in texts]
+
+
+def load_terms(path):
+    with open(path, encoding='utf-8') as handle:
+        return [line.strip() for line in handle if line.strip() and not line.startswith('#')]
+
+
+class _ModeratorCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._moderator = None
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._moderator is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return self._moderator
+        with self._lock:
+            path = settings.CHAT_MODERATION_WORDLIST
+            try:
+                mtime = os.stat(path).st_mtime
+                if self._moderator is None or mtime != self._mtime:
+                    self._moderator = Moderator(load_terms(path))
+                    self._mtime = mtime
+            except OSError:
+                # Log once per outage, not on every reload check
+                if self._moderator is None or self._mtime is not None:
+                    logger.exception("Cannot read chat moderation word list %s; abusive terms are not blocked", path)
+                    self._moderator = Moderator([])
+                    self._mtime = None
+            self._checked_at = now
+            return self._moderator
+
+
+_cache = _ModeratorCache()
+
+
+def get_moderator():
+    """The moderator for the current word list, rebuilt when the file changes."""
+    return _cache.get()
+
+
+def scan(text):
+    return get_moderator().scan(text)
+
+
+def scan_many(texts):
+    return get_moderator().scan_many(texts)
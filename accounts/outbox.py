@@ -0,0 +1,166 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.utils.timezone import now
+
+from .models import EmailOutbox
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+LEASE_SECONDS = 5 * 60
+
+
+def _outbox_row(message):
+    html_body = ''
+    for content, mimetype in getattr(message, 'alternatives', []):
+        if mimetype == 'text/html':
+            html_body = content
+    return EmailOutbox(
+        subject=message.subject,
+        from_email=message.from_email,
+        to=','.join(message.to),
+        text_body=message.body,
+        html_body=html_body,
+    )
+
+
+def enqueue(message):
+    """Store an EmailMessage in the outbox; a worker picks it up on its next poll."""
+    row = _outbox_row(message)
+    row.save(force_insert=True)
+    return row
+
+
+def enqueue_many(messages):
+    """Store several EmailMessages with one INSERT."""
+    return EmailOutbox.objects.bulk_create([_outbox_row(message) for message in messages])
+
+
+def to_message(row, connection=None):
+    message = EmailMultiAlternatives(
+        row.subject, row.text_body, row.from_email, row.to.split(','), connection=connection
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, "text/html")
+    return message
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to ``batch_size`` due rows to the calling worker. Rows locked by
+    another worker are skipped rather than waited on.
+    """
+    current = now()
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=current)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids).update(
+            status='sending', next_attempt_at=current + timedelta(seconds=LEASE_SECONDS)
+        )
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def deliver_batch(rows, connection=None):
+    """Send leased rows over one backend connection. Returns the number sent."""
+    if not rows:
+        return 0
+    connection = connection or get_connection()
+    sent_ids = []
+    try:
+        connection.open()
+    except Exception as exc:  # noqa: BLE001 - e.g. SMTP server down; retry the whole batch
+        for row in rows:
+            _schedule_retry(row, exc)
+        return 0
+    try:
+        for row in rows:
+            try:
+                connection.send_messages([to_message(row, connection)])
+            except Exception as exc:  # noqa: BLE001 - any backend error is retryable
+                _schedule_retry(row, exc)
+            else:
+                sent_ids.append(row.id)
+    finally:
+        connection.close()
+    if sent_ids:
+        EmailOutbox.objects.filter(id__in=sent_ids).update(status='sent', sent_at=now(), last_error='')
+    return len(sent_ids)
+
+
+def _schedule_retry(row, exc):
+    attempts = row.attempts + 1
+    fields = {'attempts': attempts, 'last_error': repr(exc)[:2000]}
+    if attempts >= MAX_ATTEMPTS:
+        fields['status'] = 'dead'
+        logger.error("Giving up on outbox email %s after %s attempts: %r", row.uid, attempts, exc)
+    else:
+        fields['status'] = 'pending'
+        fields['next_attempt_at'] = now() + backoff(attempts)
+        logger.warning("Outbox email %s failed (attempt %s): %r", row.uid, attempts, exc)
+    EmailOutbox.objects.filter(id=row.id).update(**fields)
+
+
+def drain(batch_size=50, connection=None):
+    """Deliver everything currently due. Returns the number of emails sent."""
+    total = 0
+    while True:
+        rows = claim_batch(batch_size)
+        if not rows:
+            return total
+        total += deliver_batch(rows, connection)
+
+
+class OutboxWorkerPool:
+    """
+    A fixed number of threads draining the outbox until ``stop()`` is called.
+    Enqueueing happens in other processes, so idle workers poll every
+    ``poll_interval`` seconds rather than waiting to be woken.
+    """
+
+    def __init__(self, workers=2, batch_size=50, poll_interval=5.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'email-outbox-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = drain(self.batch_size)
+            except Exception:  # noqa: BLE001 - keep the worker alive on DB hiccups
+                logger.exception("Email outbox worker failed")
+                sent = 0
+            finally:
+                close_old_connections()
+            if not sent:
+                self._stop.wait(self.poll_interval)
@@ -0,0 +1,84 @@
+from django.core import signing
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a newest-first ``(field, id)`` key.
+
+    Each page is a single indexed range query of ``per_page + 1`` rows, so the
+    cost does not grow with how deep the user has scrolled and no COUNT(*) is run.
+    Cursors are signed so clients cannot forge arbitrary key values.
+    """
+    salt = 'accounts.pagination'
+
+    def __init__(self, queryset, per_page, field='created_at'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def get_page(self, cursor=None):
+        direction, key = self._decode(cursor)
+        queryset = self.queryset
+        if key is None:
+            direction = 'next'
+        elif direction == 'next':
+            queryset = queryset.filter(self._after(key))
+        else:
+            queryset = queryset.filter(self._before(key))
+
+        if direction == 'next':
+            rows = list(queryset.order_by(f'-{self.field}', '-id')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next, has_previous = has_more, key is not None
+        else:
+            rows = list(queryset.order_by(self.field, 'id')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next, has_previous = True, has_more
+
+        next_cursor = self._encode('next', rows[-1]) if rows and has_next else None
+        previous_cursor = self._encode('prev', rows[0]) if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _after(self, key):
+        value, pk = key
+        return Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'id__lt': pk})
+
+    def _before(self, key):
+        value, pk = key
+        return Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, 'id__gt': pk})
+
+    def _encode(self, direction, row):
+        value = getattr(row, self.field)
+        return signing.dumps([direction, value.isoformat(), row.pk], salt=self.salt, compress=True)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return 'next', None
+        try:
+            direction, value, pk = signing.loads(cursor, salt=self.salt)
+        except (signing.BadSignature, ValueError, TypeError):
+            return 'next', None
+        field = self.queryset.model._meta.get_field(self.field)
+        return direction, (field.to_python(value), int(pk))
@@ -0,0 +1,130 @@
+"""
+Background image processing.
+
+Uploads are stored raw and their row marked 'processing'. Workers compress the
+raw file into the content-addressed blob store (see blobs.py) and swap it in
+with one conditional UPDATE that only matches while the row still points at
+the same raw file in the 'processing' state. If the user replaced the photo
+meanwhile (or another worker got there first) the update matches nothing and
+the blob reference is released again, so no lock is held while Pillow runs.
+"""
+import logging
+import threading
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+from django.db.models.functions import Mod
+from django.utils.timezone import now
+from PIL import UnidentifiedImageError
+
+from .blobs import acquire, find_source, release_name, settings_key, source_digest, store
+from .models import PremiumUser, UploadImage, UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+# ``photo`` fields get display variants and a perceptual hash; ``timestamp`` is bumped on swap
+ProcessedField = namedtuple('ProcessedField', ['model', 'field', 'compressor', 'photo', 'timestamp'])
+
+PROCESSED_FIELDS = [
+    ProcessedField(UserProfile, 'image', 'compress_image', True, 'updated_at'),
+    ProcessedField(UploadImage, 'image', 'compress_image', True, 'updated'),
+    ProcessedField(PremiumUser, 'receipt', 'compress_receipt', False, 'updated'),
+]
+
+
+def _state_field(spec):
+    return f'{spec.field}_state'
+
+
+def pending(spec, batch_size, slot=0, slots=1):
+    """Rows of ``spec.model`` waiting for processing, optionally only one of ``slots`` partitions."""
+    queryset = spec.model.objects.filter(**{_state_field(spec): 'processing'})
+    if slots > 1:
+        queryset = queryset.annotate(worker_slot=Mod('pk', slots)).filter(worker_slot=slot)
+    return list(queryset.order_by('pk')[:batch_size])
+
+
+def process(spec, instance):
+    """Compress one raw upload and swap its blob in. Returns True if this call's result was kept."""
+    raw = getattr(instance, spec.field)
+    raw_name = raw.name
+    still_raw = {'pk': instance.pk, spec.field: raw_name, _state_field(spec): 'processing'}
+    try:
+        source = source_digest(raw, settings_key(instance))
+        blob = find_source(source)
+        if blob is None or not acquire(blob):
+            data = getattr(instance, spec.compressor)(raw).read()
+            blob = store(data, source, spec.photo or None)
+            while not acquire(blob):
+                blob = store(data, source, spec.photo or None)
+    except (ValidationError, UnidentifiedImageError, OSError) as exc:
+        logger.warning("Could not process %s %s: %r", spec.model.__name__, instance.pk, exc)
+        if spec.model.objects.filter(**still_raw).update(**{spec.field: '', _state_field(spec): 'failed'}):
+            raw.storage.delete(raw_name)
+        return False
+    finally:
+        raw.close()
+    processed = {spec.field: blob.name, _state_field(spec): 'ready', spec.timestamp: now()}
+    if spec.photo:
+        processed[f'{spec.field}_dhash'] = blob.dhash
+    swapped = spec.model.objects.filter(**still_raw).update(**processed)
+    if not swapped:
+        release_name(blob.name)
+        return False
+    raw.storage.delete(raw_name)
+    return True
+
+
+def process_pending(batch_size=20, slot=0, slots=1):
+    """Process everything currently waiting. Returns the number of files swapped in."""
+    done = 0
+    for spec in PROCESSED_FIELDS:
+        while True:
+            rows = pending(spec, batch_size, slot, slots)
+            if not rows:
+                break
+            for instance in rows:
+                done += process(spec, instance)
+            if len(rows) < batch_size:
+                break
+    return done
+
+
+class ImageWorkerPool:
+    """
+    A fixed number of threads processing raw uploads until ``stop()`` is called.
+    Pillow releases the GIL while decoding and encoding, so threads scale. Each
+    thread owns the rows with ``pk % workers == index``.
+    """
+
+    def __init__(self, workers=2, batch_size=20, poll_interval=2.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(index,), name=f'image-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self, index):
+        while not self._stop.is_set():
+            try:
+                done = process_pending(self.batch_size, index, self.workers)
+            except Exception:  # noqa: BLE001 - keep the worker alive on DB hiccups
+                logger.exception("Image worker failed")
+                done = 0
+            finally:
+                close_old_connections()
+            if not done:
+                self._stop.wait(self.poll_interval)
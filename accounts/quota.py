@@ -0,0 +1,86 @@
+"""
+Daily interest quota for free users.
+
+Each user's count for the current IST day lives in the cache under
+interest_quota:<user_id>:<date> and expires at the next IST midnight (the site
+TIME_ZONE), so a new day starts from zero without a reset job. ``claim_interest``
+increments first and checks the new value: the increment is the atomic
+test-and-set, so concurrent requests get distinct counts and at most
+FREE_DAILY_INTERESTS of them succeed, in one cache round trip. The counter
+must live in the shared cache (settings.CACHES, Redis) so every web process
+increments the same key; a per-process cache would give each its own quota.
+
+A missing counter (first claim of the day, evicted or flushed cache) is seeded
+from the ProfileInterest rows sent since midnight, a range scan on
+interest_sender_created_idx. ``cache.add`` lets only one concurrent seeder win.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ProfileInterest
+
+
+def _day_bounds():
+    """(start, end) of the current day in the site time zone, as aware datetimes."""
+    today = timezone.localdate()
+    start = timezone.make_aware(datetime.combine(today, time.min))
+    return start, timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+
+
+def _key(user_id, start):
+    return f'interest_quota:{user_id}:{start.date().isoformat()}'
+
+
+def _seed(user_id, start, end):
+    """Store the database count for today unless another request already has; returns the key."""
+    key = _key(user_id, start)
+    sent = ProfileInterest.objects.filter(sender_id=user_id, created_at__gte=start, created_at__lt=end).count()
+    cache.add(key, sent, max(1, int((end - timezone.now()).total_seconds())))
+    return key
+
+
+def interests_sent_today(user_id):
+    start, end = _day_bounds()
+    sent = cache.get(_key(user_id, start))
+    if sent is None:
+        sent = cache.get(_seed(user_id, start, end), 0)
+    return sent
+
+
+def claim_interests(user_id, count, limit=None):
+    """
+    Count up to ``count`` interests against today's quota in one increment and
+    return how many fit under ``limit`` (FREE_DAILY_INTERESTS); the rest are
+    handed straight back.
+    """
+    limit = settings.FREE_DAILY_INTERESTS if limit is None else limit
+    start, end = _day_bounds()
+    key = _key(user_id, start)
+    try:
+        sent = cache.incr(key, count)
+    except ValueError:
+        sent = cache.incr(_seed(user_id, start, end), count)
+    over = min(count, max(0, sent - limit))
+    if over:
+        cache.decr(key, over)
+    return count - over
+
+
+def claim_interest(user_id, limit=None):
+    """
+    Count one interest against today's quota. Returns False, without using up
+    quota, if ``user_id`` has already sent ``limit`` (FREE_DAILY_INTERESTS) today.
+    """
+    return claim_interests(user_id, 1, limit) == 1
+
+
+def refund_interest(user_id, count=1):
+    """Give back claims whose interests were not created."""
+    start, _ = _day_bounds()
+    try:
+        cache.decr(_key(user_id, start), count)
+    except ValueError:
+        pass  # expired at midnight or evicted; the next seed recounts from the database
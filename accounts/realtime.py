@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseBroker:
+    """
+    Fan-out of chat events to connected users. ``publish`` is called from sync
+    code (views, signals); ``subscribe`` is consumed by the async event stream.
+    """
+
+    def publish(self, user_id, event):
+        raise NotImplementedError
+
+    async def subscribe(self, user_id, heartbeat=25):
+        """Yield events for ``user_id``, or None every ``heartbeat`` seconds when idle."""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+
+class InProcessBroker(BaseBroker):
+    """Delivers events to subscribers in this process only: tests and single-node deployments."""
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:  # subscriber's loop already closed
+                pass
+
+    @staticmethod
+    def _put(queue, event):
+        if queue.full():  # slow consumer: drop the oldest event rather than block publishers
+            queue.get_nowait()
+            logger.warning("Dropping chat event for slow subscriber")
+        queue.put_nowait(event)
+
+    async def subscribe(self, user_id, heartbeat=25):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[user_id]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.CHAT_BROKER)()
+
+
+def message_event(message):
+    return {
+        'type': 'message',
+        'id': message.id,
+        'sender': message.sender.username,
+        'receiver': message.receiver.username,
+        'message': message.message,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+def publish_message(message):
+    event = message_event(message)
+    broker = get_broker()
+    broker.publish(message.sender_id, event)
+    broker.publish(message.receiver_id, event)
+
+
+def publish_read(reader, peer, last_read_id):
+    """Tell ``peer`` that ``reader`` has seen every message up to ``last_read_id``."""
+    get_broker().publish(peer.pk, {'type': 'read', 'reader': reader.username, 'last_read_id': last_read_id})
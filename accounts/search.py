@@ -0,0 +1,96 @@
+from datetime import date
+
+from .models import ProfileInterest, ProfileSearch, UserProfile
+
+
+SEARCH_FIELDS = ['caste', 'religion', 'country', 'state', 'city']
+
+
+def normalize(value):
+    """Lowercase and collapse whitespace so filters can use exact, indexed matches."""
+    if not value:
+        return ''
+    return ' '.join(str(value).split()).casefold()
+
+
+def _clip(field, value):
+    """Trim a normalized value to its ProfileSearch column length."""
+    return value[:ProfileSearch._meta.get_field(field).max_length]
+
+
+def build_search_entry(profile):
+    entry = ProfileSearch(
+        profile_id=profile.pk,
+        user_id=profile.user_id,
+        is_verified=profile.user.is_verified,
+        gender=normalize(profile.gender),
+        dob=profile.dob,
+        created_at=profile.created_at,
+    )
+    for field in SEARCH_FIELDS:
+        setattr(entry, field, _clip(field, normalize(getattr(profile, field))))
+    return entry
+
+
+def sync_profile_search(profile):
+    """Write the search entry for ``profile``; return ``(previous entry or None, new entry)``."""
+    previous = ProfileSearch.objects.filter(profile_id=profile.pk).first()
+    entry = build_search_entry(profile)
+    if previous is not None:
+        entry.pk = previous.pk
+        entry.save(force_update=True)
+    else:
+        entry.save(force_insert=True)
+    return previous, entry
+
+
+def sync_user_verification(user):
+    """Carry ``user.is_verified`` over to their search entries; return the entries as they were."""
+    previous = list(ProfileSearch.objects.filter(user_id=user.pk).exclude(is_verified=user.is_verified))
+    if previous:
+        ProfileSearch.objects.filter(pk__in=[entry.pk for entry in previous]).update(is_verified=user.is_verified)
+    return previous
+
+
+def search_profiles(user=None, gender=None, min_age=None, max_age=None, exclude_contacted=False, **filters):
+    """
+    Return verified ProfileSearch rows matching the feed filters, excluding
+    ``user`` and, with ``exclude_contacted``, the profiles they sent an interest to.
+    """
+    entries = ProfileSearch.objects.filter(is_verified=True)
+    if user is not None:
+        entries = entries.exclude(user=user)
+        if exclude_contacted:
+            # NOT IN subquery over the (sender, receiver) unique index
+            contacted = ProfileInterest.objects.filter(sender=user).values('receiver_id')
+            entries = entries.exclude(profile_id__in=contacted)
+    if gender:
+        entries = entries.filter(gender=normalize(gender))
+    today = date.today()
+    if min_age:
+        entries = entries.filter(dob__lte=_years_ago(today, int(min_age)))  # born before or on
+    if max_age:
+        entries = entries.filter(dob__gte=_years_ago(today, int(max_age)))  # born after or on
+    for field in SEARCH_FIELDS:
+        value = normalize(filters.get(field))
+        if value:
+            entries = entries.filter(**{field: _clip(field, value)})
+    return entries
+
+
+def load_profiles(entries):
+    """Fetch the full UserProfile rows for a page of search entries, keeping their order."""
+    ids = [entry.profile_id for entry in entries]
+    profiles = (
+        UserProfile.objects.select_related('user')
+        .prefetch_related('gallery_image')
+        .in_bulk(ids)
+    )
+    return [profiles[pk] for pk in ids if pk in profiles]
+
+
+def _years_ago(today, years):
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # 29 Feb
+        return today.replace(year=today.year - years, day=28)
@@ -0,0 +1,78 @@
+import copy
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .blobs import release
+from .chat import record_message
+from .entitlements import forget_premium
+from .facets import record_labels, record_profile_change
+from .moderation import scan
+from .models import ChatMessage, PremiumUser, ProfileSearch, UploadImage, UserAccount, UserProfile
+from .realtime import publish_message
+from .search import sync_profile_search, sync_user_verification
+
+
+@receiver(post_save, sender=UserProfile)
+def update_profile_search(sender, instance, **kwargs):
+    previous, entry = sync_profile_search(instance)
+    record_profile_change(previous, entry)
+    record_labels(instance)
+
+
+@receiver(pre_delete, sender=UserProfile)
+def stash_search_entry(sender, instance, **kwargs):
+    # The search entry is cascade-deleted with the profile; keep it for the facet counters
+    instance._search_entry = ProfileSearch.objects.filter(profile_id=instance.pk).first()
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_profile_facets(sender, instance, **kwargs):
+    record_profile_change(getattr(instance, '_search_entry', None), None)
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=UploadImage)
+@receiver(post_delete, sender=PremiumUser)
+def release_media(sender, instance, **kwargs):
+    """Drop the deleted row's file references once the delete is committed."""
+    for field in ('image', 'identity_proof', 'receipt'):
+        field_file = getattr(instance, field, None)
+        if field_file:
+            transaction.on_commit(partial(release, field_file))
+
+
+@receiver(post_save, sender=PremiumUser)
+@receiver(post_delete, sender=PremiumUser)
+def invalidate_premium(sender, instance, **kwargs):
+    transaction.on_commit(partial(forget_premium, [instance.user_id]))
+
+
+@receiver(post_save, sender=UserAccount)
+def update_profile_search_verification(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'is_verified' not in update_fields:
+        return  # e.g. last_login updates
+    for previous in sync_user_verification(instance):
+        entry = copy.copy(previous)
+        entry.is_verified = instance.is_verified
+        record_profile_change(previous, entry)
+
+
+@receiver(pre_save, sender=ChatMessage)
+def moderate_chat_message(sender, instance, **kwargs):
+    """Blank out new messages containing abuse or a mobile number; the view warns the sender."""
+    if not instance._state.adding:
+        return
+    instance.moderation = scan(instance.message)
+    if instance.moderation.abuse or instance.moderation.mobile:
+        instance.message = " "
+
+
+@receiver(post_save, sender=ChatMessage)
+def update_conversation(sender, instance, created, **kwargs):
+    if created:
+        record_message(instance)
+        if instance.sender_id and instance.receiver_id:
+            transaction.on_commit(partial(publish_message, instance))
@@ -0,0 +1,211 @@
+"""
+Near-duplicate photo lookup over the dHash columns of UserProfile and UploadImage.
+
+Hashes are indexed with multi-index hashing: the 64-bit hash is split into four
+16-bit chunks and each chunk gets a table mapping chunk value → photos. Two
+hashes within Hamming distance r agree to within r // 4 bits on at least one
+chunk, so a query only probes the few chunk values near its own (137 per chunk
+for r < 12) and checks the candidates' full distance. Tables are flat arrays
+(counting-sorted ids plus bucket offsets), a few bytes per photo, so a million
+photos fit in memory and queries take milliseconds.
+
+The index is a per-process snapshot. Rows added or changed since the last
+build are picked up from an overflow list on the next query, the snapshot is
+rebuilt every REBUILD_SECONDS, and every match is re-checked against the
+database before it is returned.
+"""
+import threading
+import time
+from array import array
+from collections import namedtuple
+from itertools import combinations
+
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import UploadImage, UserProfile
+
+
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+DEFAULT_RADIUS = 8
+REFRESH_SECONDS = 30
+REBUILD_SECONDS = 60 * 60
+MAX_OVERFLOW = 50000
+
+# (source label, model, timestamp field bumped when the image changes)
+SOURCES = [
+    ('profile', UserProfile, 'updated_at'),
+    ('gallery', UploadImage, 'updated'),
+]
+SOURCE_MODELS = {label: model for label, model, _ in SOURCES}
+
+Match = namedtuple('Match', ['source', 'pk', 'distance'])
+
+
+def to_signed(value):
+    """Unsigned 64-bit hash → value that fits a BigIntegerField."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def _ball(value, radius):
+    """Every CHUNK_BITS-bit value within ``radius`` bit flips of ``value``."""
+    yield value
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), flips):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            yield value ^ mask
+
+
+class HashIndex:
+    def __init__(self, entries):
+        """``entries``: iterable of (source, pk, unsigned hash)."""
+        self.sources, self.pks, self.hashes = array('B'), array('q'), array('Q')
+        labels = [label for label, _, _ in SOURCES]
+        for source, pk, value in entries:
+            self.sources.append(labels.index(source))
+            self.pks.append(pk)
+            self.hashes.append(value)
+        self.labels = labels
+        self.tables = [self._build_table(chunk) for chunk in range(CHUNKS)]
+        self.overflow = []  # (source, pk, hash) added since the build, scanned linearly
+
+    def __len__(self):
+        return len(self.hashes) + len(self.overflow)
+
+    def _build_table(self, chunk):
+        shift = chunk * CHUNK_BITS
+        keys = [(value >> shift) & CHUNK_MASK for value in self.hashes]
+        offsets = array('I', [0]) * (CHUNK_MASK + 2)
+        for key in keys:
+            offsets[key + 1] += 1
+        for key in range(CHUNK_MASK + 1):
+            offsets[key + 1] += offsets[key]
+        ids = array('I', [0]) * len(keys)
+        cursor = array('I', offsets)
+        for index, key in enumerate(keys):
+            ids[cursor[key]] = index
+            cursor[key] += 1
+        return offsets, ids
+
+    def add(self, source, pk, value):
+        self.overflow.append((source, pk, value))
+
+    def search(self, value, radius=DEFAULT_RADIUS):
+        """Matches within ``radius`` bits, nearest first."""
+        matches = {}
+        seen = set()
+        chunk_radius = radius // CHUNKS
+        for chunk, (offsets, ids) in enumerate(self.tables):
+            shift = chunk * CHUNK_BITS
+            for key in _ball((value >> shift) & CHUNK_MASK, chunk_radius):
+                for position in range(offsets[key], offsets[key + 1]):
+                    index = ids[position]
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    distance = (self.hashes[index] ^ value).bit_count()
+                    if distance <= radius:
+                        key_ = (self.labels[self.sources[index]], self.pks[index])
+                        matches[key_] = min(distance, matches.get(key_, 64))
+        for source, pk, other in self.overflow:
+            distance = (other ^ value).bit_count()
+            if distance <= radius:
+                matches[(source, pk)] = min(distance, matches.get((source, pk), 64))
+        return sorted((Match(source, pk, distance) for (source, pk), distance in matches.items()),
+                      key=lambda match: match.distance)
+
+
+def _rows(model, condition=Q()):
+    return (
+        model.objects.filter(condition, image_dhash__isnull=False, image_state='ready')
+        .values_list('pk', 'image_dhash')
+        .iterator(chunk_size=5000)
+    )
+
+
+class _IndexCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._built_at = 0
+        self._refreshed_at = 0
+        self._since = None
+        self._last_pks = {}
+
+    def get(self):
+        with self._lock:
+            current = time.monotonic()
+            if (self._index is None or current - self._built_at > REBUILD_SECONDS
+                    or len(self._index.overflow) > MAX_OVERFLOW):
+                self._build(current)
+            elif current - self._refreshed_at > REFRESH_SECONDS:
+                self._refresh(current)
+            return self._index
+
+    def _build(self, current):
+        self._since = now()
+        entries = []
+        for label, model, _ in SOURCES:
+            last_pk = 0
+            for pk, value in _rows(model):
+                entries.append((label, pk, to_unsigned(value)))
+                last_pk = max(last_pk, pk)
+            self._last_pks[label] = last_pk
+        self._index = HashIndex(entries)
+        self._built_at = self._refreshed_at = current
+
+    def _refresh(self, current):
+        since, self._since = self._since, now()
+        for label, model, timestamp in SOURCES:
+            condition = Q(pk__gt=self._last_pks[label]) | Q(**{f'{timestamp}__gte': since})
+            for pk, value in _rows(model, condition):
+                self._index.add(label, pk, to_unsigned(value))
+                self._last_pks[label] = max(self._last_pks[label], pk)
+        self._refreshed_at = current
+
+    def clear(self):
+        with self._lock:
+            self._index = None
+
+
+_cache = _IndexCache()
+
+
+def get_index():
+    return _cache.get()
+
+
+def find_similar(hashes, radius=DEFAULT_RADIUS, exclude=()):
+    """
+    Photos within ``radius`` bits of any of ``hashes`` (signed dHash values),
+    skipping the (source, pk) pairs in ``exclude``. Each candidate's current
+    hash is re-read, so replaced photos never show up as stale matches.
+    Returns Match tuples, nearest first.
+    """
+    index = get_index()
+    candidates = set()
+    for signed in hashes:
+        if signed is not None:
+            candidates.update((match.source, match.pk) for match in index.search(to_unsigned(signed), radius))
+    candidates.difference_update(exclude)
+    matches = []
+    for label, model in SOURCE_MODELS.items():
+        pks = [pk for source, pk in candidates if source == label]
+        if not pks:
+            continue
+        for pk, current in model.objects.filter(pk__in=pks, image_state='ready').values_list('pk', 'image_dhash'):
+            if current is None:
+                continue
+            distance = min((to_unsigned(current) ^ to_unsigned(signed)).bit_count()
+                           for signed in hashes if signed is not None)
+            if distance <= radius:
+                matches.append(Match(label, pk, distance))
+    return sorted(matches, key=lambda match: match.distance)
@@ -0,0 +1,10 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.filter
+def contacted(profile_id, contacted_set):
+    """``{% if profile.id|contacted:sent_interest_ids %}``: a bisect lookup in a ContactedSet."""
+    return profile_id in contacted_set
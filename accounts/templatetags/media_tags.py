@@ -0,0 +1,65 @@
+from django import template
+from django.core.cache import cache
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from accounts.images import STANDARD_SIZE, VARIANT_WIDTHS, variant_name
+
+
+register = template.Library()
+
+PLACEHOLDER_IMAGE = 'images/default-profile.png'
+VARIANTS_TIMEOUT = 24 * 60 * 60
+MISSING_VARIANTS_TIMEOUT = 10 * 60  # re-check images still waiting for backfill_image_variants
+
+
+def ensure_variants(field_file):
+    """
+    True if the display variants of ``field_file`` exist. Processing renders
+    them for new uploads; older files get them from ``backfill_image_variants``
+    and are shown as the plain original until then, so nothing is rendered in
+    the request. The storage check is cached either way.
+    """
+    key = f"image_variants:{field_file.name}"
+    present = cache.get(key)
+    if present is None:
+        # The smallest JPEG is written last, so its presence means the set is complete
+        present = field_file.storage.exists(variant_name(field_file.name, VARIANT_WIDTHS[-1], 'jpg'))
+        cache.set(key, present, VARIANTS_TIMEOUT if present else MISSING_VARIANTS_TIMEOUT)
+    return present
+
+
+def _srcset(field_file, ext):
+    storage = field_file.storage
+    candidates = [
+        f"{storage.url(variant_name(field_file.name, width, ext))} {width}w"
+        for width in reversed(VARIANT_WIDTHS)
+    ]
+    candidates.append(f"{field_file.url} {STANDARD_SIZE[0]}w")
+    return ', '.join(candidates)
+
+
+@register.simple_tag
+def responsive_image(field_file, sizes='100vw', alt='', css_class=''):
+    """
+    ``<picture>`` for an image field: WebP and JPEG srcsets over the 96/240/480px
+    variants plus the original, so the browser downloads the smallest file that
+    fills ``sizes``. Falls back to a plain ``<img>`` of the original, or of the
+    default picture while the upload is still being processed.
+    """
+    if not field_file:
+        return ''
+    state = getattr(field_file.instance, f'{field_file.field.name}_state', 'ready')
+    if state != 'ready':
+        # Raw upload still waiting for run_image_processing; don't ship the full-size original
+        return format_html('<img src="{}" alt="{}" class="{}">', static(PLACEHOLDER_IMAGE), alt, css_class)
+    if not ensure_variants(field_file):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', field_file.url, alt, css_class)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(field_file, 'webp'), sizes,
+        field_file.url, _srcset(field_file, 'jpg'), sizes, alt, css_class,
+    )
@@ -0,0 +1,325 @@
+import io
+import shutil
+import tempfile
+
+from django import forms
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import moderation
+from .blobs import acquire, release_name, store
+from .forms import UserProfileForm
+from .interests import send_interests
+from .matches import record_matches
+from .models import EmailOutbox, Match, MediaBlob, ProfileInterest, ProfileSearch, UserAccount, UserProfile
+from .outbox import MAX_ATTEMPTS, drain, enqueue
+from .pagination import KeysetPaginator
+from .quota import claim_interests, interests_sent_today, refund_interest
+
+
+class FailingSendBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("send failed")
+
+
+class FailingOpenBackend(EmailBackend):
+    def open(self):
+        raise ConnectionError("connection refused")
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTests(TestCase):
+    def queue(self, subject='Hello'):
+        return enqueue(EmailMessage(subject, 'Body', 'from@example.com', ['to@example.com']))
+
+    def due(self, row):
+        EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=row.created_at)
+
+    def test_send(self):
+        row = self.queue()
+        self.assertEqual(drain(), 1)
+        self.assertEqual([message.subject for message in mail.outbox], ['Hello'])
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'sent')
+        self.assertIsNotNone(row.sent_at)
+        self.assertEqual(drain(), 0)
+
+    def test_send_failure_is_retried(self):
+        row = self.queue()
+        self.assertEqual(drain(connection=FailingSendBackend()), 0)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ('pending', 1))
+        self.assertIn('send failed', row.last_error)
+        self.assertEqual(drain(), 0)  # backing off
+
+        self.due(row)
+        self.assertEqual(drain(), 1)
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'sent')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_connection_failure_retries_whole_batch(self):
+        rows = [self.queue('First'), self.queue('Second')]
+        self.assertEqual(drain(connection=FailingOpenBackend()), 0)
+        for row in rows:
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts), ('pending', 1))
+            self.assertIn('connection refused', row.last_error)
+
+    def test_dead_letter_after_max_attempts(self):
+        row = self.queue()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.due(row)
+            drain(connection=FailingSendBackend())
+            row.refresh_from_db()
+            self.assertEqual(row.attempts, attempt)
+        self.assertEqual(row.status, 'dead')
+        self.due(row)
+        self.assertEqual(drain(), 0)
+        self.assertEqual(mail.outbox, [])
+
+
+def jpeg_bytes(color='red', size=(300, 300)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def make_member(n, gender='Female', verified=True, **fields):
+    user = UserAccount.objects.create_user(f'u{n}@example.com', 'pw', username=f'u{n}')
+    user.is_verified = verified
+    user.save()
+    profile = UserProfile(user=user, gender=gender, **fields)
+    profile.save()
+    return user, profile
+
+
+class MediaTestCase(TestCase):
+    """Writes uploads and blobs under a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_PROCESSING_SYNC=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class ProfileFormTests(MediaTestCase):
+    def post_data(self, **files):
+        data = {}
+        for name, field in UserProfileForm.base_fields.items():
+            if isinstance(field, forms.FileField):
+                continue
+            if getattr(field, 'choices', None):
+                data[name] = next(value for value, _ in field.choices if value)
+            elif isinstance(field, forms.DateField):
+                data[name] = '1995-01-01'
+            elif isinstance(field, (forms.IntegerField, forms.DecimalField)):
+                data[name] = '1'
+            else:
+                data[name] = 'Patna'
+        data.update(phone_no='9876543210', first_name='Asha', last_name='Kumari')
+        data['image'] = SimpleUploadedFile('photo.jpg', jpeg_bytes('red'), 'image/jpeg')
+        data['identity_proof'] = SimpleUploadedFile('id.jpg', jpeg_bytes('blue'), 'image/jpeg')
+        data.update(files)
+        return data
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserAccount.objects.create_user('new@example.com', 'pw', username='new')
+        self.client.force_login(self.user)
+
+    def test_internal_fields_are_not_form_fields(self):
+        for name in ('image_state', 'image_dhash', 'user', 'uid'):
+            self.assertNotIn(name, UserProfileForm.base_fields)
+
+    def test_create_profile(self):
+        response = self.client.post(reverse('create_profile'), self.post_data(image_state='failed', image_dhash='1'))
+        self.assertRedirects(response, reverse('profiles_list'), fetch_redirect_response=False)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.image_state, 'ready')
+        self.assertTrue(profile.image.name.startswith('blobs/'))
+        self.assertEqual(profile.image_dhash, MediaBlob.objects.get(name=profile.image.name).dhash)
+        self.assertTrue(ProfileSearch.objects.filter(profile=profile, city='patna').exists())
+
+    @override_settings(MAX_UPLOAD_SIZE=2048)
+    def test_oversized_upload_is_a_form_error(self):
+        big = SimpleUploadedFile('big.jpg', jpeg_bytes('red', (400, 400)) + b'\0' * 4096, 'image/jpeg')
+        response = self.client.post(reverse('create_profile'), self.post_data(image=big))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('too large', str(response.context['form'].errors['image']))
+        self.assertFalse(UserProfile.objects.get(user=self.user).image)
+
+
+class BlobRefcountTests(MediaTestCase):
+    def stored(self, data):
+        blob = store(data)
+        self.assertTrue(acquire(blob))
+        return blob
+
+    def test_identical_content_shares_one_blob(self):
+        first, second = self.stored(jpeg_bytes()), self.stored(jpeg_bytes())
+        self.assertEqual(first.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.refcount, 2)
+
+    def test_last_release_deletes_the_file(self):
+        blob = self.stored(jpeg_bytes())
+        self.stored(jpeg_bytes())
+        with self.captureOnCommitCallbacks(execute=True):
+            release_name(blob.name)
+        self.assertTrue(default_storage.exists(blob.name))
+        # Files are deleted only once the releasing transaction commits
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            release_name(blob.name)
+            self.assertTrue(default_storage.exists(blob.name))
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.name))
+        # Storing the content again brings the file back under a new row
+        again = self.stored(jpeg_bytes())
+        self.assertTrue(default_storage.exists(again.name))
+
+    def test_rolled_back_release_keeps_the_file(self):
+        blob = self.stored(jpeg_bytes())
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            release_name(blob.name)
+            raise RuntimeError
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 1)
+        self.assertTrue(default_storage.exists(blob.name))
+
+    def test_replacing_a_photo_releases_the_old_blob(self):
+        _, profile = make_member(1)
+        profile.image = SimpleUploadedFile('a.jpg', jpeg_bytes('red'), 'image/jpeg')
+        profile.save()
+        old_name = profile.image.name
+        profile.image = SimpleUploadedFile('b.jpg', jpeg_bytes('green'), 'image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertFalse(MediaBlob.objects.filter(name=old_name).exists())
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertEqual(MediaBlob.objects.get(name=profile.image.name).refcount, 1)
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        for n in range(7):
+            make_member(n)
+        self.entries = ProfileSearch.objects.all()
+
+    def test_pages_walk_newest_first_without_gaps(self):
+        paginator = KeysetPaginator(self.entries, 3)
+        expected = list(self.entries.order_by('-created_at', '-id').values_list('pk', flat=True))
+        seen, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            seen += [entry.pk for entry in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        paginator = KeysetPaginator(self.entries, 3)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertFalse(first.has_previous())
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual([entry.pk for entry in back], [entry.pk for entry in first])
+
+    def test_tampered_cursor_falls_back_to_the_first_page(self):
+        paginator = KeysetPaginator(self.entries, 3)
+        first = paginator.get_page()
+        page = paginator.get_page(first.next_cursor[:-2] + 'xx')
+        self.assertEqual([entry.pk for entry in page], [entry.pk for entry in first])
+
+
+class InterestQuotaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sender, _ = make_member(0, 'Male')
+
+    def test_claims_stop_at_the_limit(self):
+        self.assertEqual(claim_interests(self.sender.pk, 2, limit=3), 2)
+        self.assertEqual(claim_interests(self.sender.pk, 2, limit=3), 1)
+        self.assertEqual(claim_interests(self.sender.pk, 1, limit=3), 0)
+        self.assertEqual(interests_sent_today(self.sender.pk), 3)
+        refund_interest(self.sender.pk)
+        self.assertEqual(claim_interests(self.sender.pk, 1, limit=3), 1)
+
+    def test_counter_is_seeded_from_todays_interests(self):
+        for n in range(1, 3):
+            ProfileInterest.objects.create(sender=self.sender, receiver=make_member(n)[1])
+        cache.clear()
+        self.assertEqual(interests_sent_today(self.sender.pk), 2)
+        self.assertEqual(claim_interests(self.sender.pk, 5, limit=3), 1)
+
+    @override_settings(FREE_DAILY_INTERESTS=2)
+    def test_bulk_send_respects_the_quota_and_is_idempotent(self):
+        receivers = [make_member(n)[1].pk for n in range(1, 4)]
+        result = send_interests(self.sender, receivers)
+        self.assertEqual((len(result.sent), result.over_quota), (2, receivers[2:]))
+        again = send_interests(self.sender, receivers[:2])
+        self.assertEqual((again.sent, again.already_sent), ([], receivers[:2]))
+        self.assertEqual(ProfileInterest.objects.filter(sender=self.sender).count(), 2)
+
+
+class MatchTests(TestCase):
+    def setUp(self):
+        self.low, self.low_profile = make_member(1, 'Male')
+        self.high, self.high_profile = make_member(2, 'Female')
+        ProfileInterest.objects.create(sender=self.low, receiver=self.high_profile)
+        ProfileInterest.objects.create(sender=self.high, receiver=self.low_profile)
+        self.emails = EmailOutbox.objects.count()
+
+    def test_match_creates_both_rows_and_two_emails(self):
+        self.assertEqual(record_matches(self.high, [self.low_profile]), [self.low_profile])
+        self.assertEqual(Match.objects.count(), 2)
+        self.assertEqual(EmailOutbox.objects.count() - self.emails, 2)
+        self.assertFalse(ProfileInterest.objects.exclude(status='accepted').exists())
+
+    def test_only_the_canonical_row_winner_notifies(self):
+        # The concurrent request inserted the canonical (smaller user id) row first
+        Match.objects.create(user=self.low, profile=self.high_profile)
+        self.assertEqual(record_matches(self.high, [self.low_profile]), [])
+        self.assertEqual(EmailOutbox.objects.count(), self.emails)
+
+    def test_canonical_row_winner_notifies_even_if_it_lost_the_other_row(self):
+        Match.objects.create(user=self.high, profile=self.low_profile)
+        self.assertEqual(record_matches(self.low, [self.high_profile]), [self.high_profile])
+        self.assertEqual(EmailOutbox.objects.count() - self.emails, 2)
+
+
+class ModerationTests(TestCase):
+    def test_abusive_terms(self):
+        moderator = moderation.Moderator(['idiot'])
+        self.assertEqual(moderator.scan('you IDIOT').terms, ['idiot'])
+        self.assertTrue(moderator.scan('you i.d.i.o.t').abuse)
+        self.assertFalse(moderator.scan('hello there').abuse)
+
+    def test_mobile_numbers(self):
+        moderator = moderation.Moderator([])
+        for text in ['call 9876543210', '+91 98765 43210', '98-76-54-32-10', '9 8 7 6 5 4 3 2 1 0',
+                     'nine eight seven six five four three two one zero']:
+            self.assertTrue(moderator.scan(text).mobile, text)
+        for text in ['meet at 6 7 8 9 10 11 12 pm', 'price 6, 7, 8, 9, 10 and 11', 'pin 800001', '1234567890']:
+            self.assertFalse(moderator.scan(text).mobile, text)
+
+    def test_missing_word_list_falls_back_to_empty(self):
+        cache_ = moderation._ModeratorCache()
+        with override_settings(CHAT_MODERATION_WORDLIST='/nonexistent/words.txt'), \
+                self.assertLogs('accounts.moderation', 'ERROR'):
+            moderator = cache_.get()
+        self.assertEqual(moderator.terms, [])
+        self.assertTrue(moderator.scan('9876543210').mobile)
@@ -0,0 +1,83 @@
+from django.core.cache import cache
+
+from .models import ConversationMember
+
+
+UNREAD_TIMEOUT = 5 * 60  # bounds how long a lost increment or a missed reconcile stays visible
+
+# Per receiver the cache holds the senders with unread messages ({sender_id: username})
+# and one integer counter per (receiver, sender), moved with cache.incr so concurrent
+# messages never overwrite each other's counts.
+
+
+def _senders_key(user_id):
+    return f'unread_senders:{user_id}'
+
+
+def _key(user_id, sender_id):
+    return f'unread_messages:{user_id}:{sender_id}'
+
+
+def _load(user_id):
+    """Fill the cache for ``user_id`` from the ConversationMember counters."""
+    rows = list(
+        ConversationMember.objects.filter(user_id=user_id, unread_count__gt=0)
+        .values_list('peer_id', 'peer__username', 'unread_count')
+    )
+    # Counters outlive the sender list so an increment never lands on an expired counter mid-window
+    cache.set_many({_key(user_id, peer_id): total for peer_id, _, total in rows}, UNREAD_TIMEOUT + 60)
+    cache.set(_senders_key(user_id), {peer_id: username for peer_id, username, _ in rows}, UNREAD_TIMEOUT)
+    return {peer_id: (username, total) for peer_id, username, total in rows}
+
+
+def get_unread(user_id):
+    """
+    Return ``{sender_id: (sender_username, count)}`` for ``user_id``. Served
+    from the cache; a miss is filled from the ConversationMember counters.
+    """
+    senders = cache.get(_senders_key(user_id))
+    if senders is None:
+        return _load(user_id)
+    totals = cache.get_many([_key(user_id, sender_id) for sender_id in senders])
+    # A missing counter was cleared by reading the conversation
+    return {
+        sender_id: (username, totals[_key(user_id, sender_id)])
+        for sender_id, username in senders.items()
+        if totals.get(_key(user_id, sender_id))
+    }
+
+
+def increment_unread(message):
+    """
+    Count a new message against its receiver. Only touches users whose counts
+    are already cached; a sender that is new to the list drops it, so the next
+    read reloads from ConversationMember (already incremented by the caller).
+    """
+    senders = cache.get(_senders_key(message.receiver_id))
+    if senders is None:
+        return
+    if message.sender_id not in senders:
+        cache.delete(_senders_key(message.receiver_id))
+        return
+    try:
+        cache.incr(_key(message.receiver_id, message.sender_id))
+    except ValueError:  # cleared or expired; the database has the count
+        cache.delete(_senders_key(message.receiver_id))
+
+
+def clear_unread(user_id, sender_id):
+    cache.delete(_key(user_id, sender_id))
+
+
+def forget_unread(user_ids):
+    cache.delete_many([_senders_key(user_id) for user_id in user_ids])
+
+
+def unread_summary(user_id):
+    """Unread counts per sender, largest first, in the shape the navbar template expects."""
+    summary = [
+        {'sender__username': username, 'total': total}
+        for username, total in get_unread(user_id).values()
+    ]
+    summary.sort(key=lambda item: -item['total'])
+    return summary
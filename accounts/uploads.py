@@ -0,0 +1,81 @@
+"""
+Bounded handling of photo and receipt uploads.
+
+BoundedUploadHandler streams every uploaded file straight to a temp file, one
+64 KB chunk at a time, so memory per upload stays at a chunk however large the
+file is or however many uploads run at once. Bytes past MAX_UPLOAD_SIZE are
+dropped instead of written and the file is flagged, so the validators below can
+reject it with a form error instead of the whole request failing.
+
+The validators only look at the byte count and the image header (format and
+declared dimensions); nothing is decoded before a file has passed them. PDF
+receipts are recognised by their signature and stored as uploaded.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import UnidentifiedImageError
+
+from .images import read_header
+
+
+PDF_SIGNATURE = b'%PDF-'
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    chunk_size = 64 * 2 ** 10
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        # Multipart parts rarely declare a length, but when they do it is checked up front
+        self.oversized = self.content_length is not None and self.content_length > settings.MAX_UPLOAD_SIZE
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if not self.oversized and self.received > settings.MAX_UPLOAD_SIZE:
+            self.oversized = True
+            # Keep the temp file (the form still gets an UploadedFile) but drop what was written
+            self.file.seek(0)
+            self.file.truncate()
+        if not self.oversized:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        upload.oversized = self.oversized
+        return upload
+
+
+def is_pdf(upload):
+    upload.seek(0)
+    signature = upload.read(len(PDF_SIGNATURE))
+    upload.seek(0)
+    return signature == PDF_SIGNATURE
+
+
+def validate_upload_size(upload):
+    if getattr(upload, 'oversized', False) or upload.size > settings.MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            f"File is too large; the limit is {settings.MAX_UPLOAD_SIZE // (1024 * 1024)} MB.",
+            code='file_too_large',
+        )
+
+
+def validate_image_upload(upload):
+    """Reject oversized files and images whose header declares too many pixels."""
+    validate_upload_size(upload)
+    try:
+        # Closing the image would close ``upload``; it only holds the parsed header
+        read_header(upload)
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError("Upload a valid image (JPEG, PNG or WebP).", code='invalid_image')
+    finally:
+        upload.seek(0)
+
+
+def validate_receipt_upload(upload):
+    """Receipts may be a PDF or an image."""
+    validate_upload_size(upload)
+    if not is_pdf(upload):
+        validate_image_upload(upload)
@@ -1,9 +1,11 @@
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
+from .outbox import enqueue
 
 
-def send_interest_email(receiver_profile, sender_user, sender_profile):
+
+def build_interest_email(receiver_profile, sender_user, sender_profile):
     subject = f"{sender_user.first_name} has shown interest in your Vivah profile"
     from_email = "noreply@example.com"
     to = [receiver_profile.user.email]
@@ -26,12 +28,12 @@ def send_interest_email(receiver_profile, sender_user, sender_profile):
 
     msg = EmailMultiAlternatives(subject, text_content, from_email, to)
     msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    return msg
 
 
-def send_interest_accept_email(receiver_profile, email, sender_first_name):
+def build_interest_accept_email(receiver_profile, email, sender_first_name):
     """
-    Send an email notification when a user's interest is accepted.
+    Build the email notification sent when a user's interest is accepted.
     receiver_profile: the profile of the person whose interest was accepted
     sender_user: the user who accepted the interest
     """
@@ -57,10 +59,36 @@ def send_interest_accept_email(receiver_profile, email, sender_first_name):
 
     msg = EmailMultiAlternatives(subject, text_content, from_email, to)
     msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    return msg
 
 
-def send_otp_email(email, otp, user_name="User"):
+def build_match_email(user, matched_profile):
+    subject = f"It's a match! You and {matched_profile.user.first_name} are interested in each other"
+    from_email = "noreply@example.com"
+    to = [user.email]
+
+    html_content = render_to_string(
+        'interest/match_email_template.html',
+        {
+            'receiver_name': user.first_name,
+            'match_name': matched_profile.user.first_name,
+            'login_url': "https://vivah-delta.vercel.app",  # replace with live URL
+        }
+    )
+    text_content = (
+        f"Hi {user.first_name},\n\n"
+        f"You and {matched_profile.user.first_name} have both expressed interest in each other on Vivah.\n"
+        f"Log in to your account to see your matches and start a conversation.\n\n"
+        f"Best wishes,\n"
+        f"Vivah Team"
+    )
+
+    msg = EmailMultiAlternatives(subject, text_content, from_email, to)
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def build_otp_email(email, otp, user_name="User"):
     subject = "OTP for Vivah Login"
     from_email = "noreply@example.com"
     to = [email]
@@ -70,5 +98,16 @@ def send_otp_email(email, otp, user_name="User"):
 
     msg = EmailMultiAlternatives(subject, text_content, from_email, to)
     msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    return msg
+
 
+def send_interest_email(receiver_profile, sender_user, sender_profile):
+    return enqueue(build_interest_email(receiver_profile, sender_user, sender_profile))
+
+
+def send_interest_accept_email(receiver_profile, email, sender_first_name):
+    return enqueue(build_interest_accept_email(receiver_profile, email, sender_first_name))
+
+
+def send_otp_email(email, otp, user_name="User"):
+    return enqueue(build_otp_email(email, otp, user_name))
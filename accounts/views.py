@@ -1,20 +1,32 @@
-from datetime import date, timedelta
-import threading
+from datetime import timedelta
+import json
 
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Max, Q
-from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.crypto import get_random_string
 from django.utils.timezone import now
-from django.http import JsonResponse
-
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+from .facets import get_dropdowns
+from .chat import inbox, mark_conversation_read, message_window, read_watermark, thread
+from .contacted import get_contacted
+from .decorators import onboarding_required
+from .entitlements import is_premium, premium_until, premium_windows
+from .gallery import ingest_gallery
+from .interests import MAX_BULK_INTERESTS, send_interests
+from .matches import my_matches
 from .forms import EmailForm, FeedbackForm, LoginForm, PremiumUserForm, OtpForm, UserProfileForm
-from .models import ChatMessage, PremiumUser, UploadImage, UserAccount, UserOtp, UserProfile, ProfileInterest
-from .utils import send_interest_accept_email, send_interest_email, send_otp_email
-from django.core.paginator import Paginator
+from .models import ChatMessage, PremiumUser, UploadImage, UserAccount, UserOtp, UserProfile, ProfileInterest, Shortlist
+from .pagination import KeysetPaginator
+from .quota import interests_sent_today
+from .realtime import get_broker, message_event, publish_read
+from .search import load_profiles, search_profiles
+from .unread import unread_summary
+from .utils import send_interest_accept_email, send_otp_email
 
 User = get_user_model()
 
@@ -31,11 +43,8 @@ def request_otp_view(request):
             )
             otp = get_random_string(length=6, allowed_chars='1234567890')
             UserOtp.objects.create(user=user, otp=otp)
-            threading.Thread(
-                target=send_otp_email,
-                args=(email, otp, user.get_full_name() or "User"),
-                daemon=True  # ensures thread closes when request ends
-            ).start()
+            # Queued; delivered by the email outbox worker
+            send_otp_email(email, otp, user.get_full_name() or "User")
             request.session['email'] = email
             return redirect('verify_otp')
     else:
@@ -108,10 +117,12 @@ def create_profile_view(request):
 
             profile.user = user
             profile.save()
-            # Bulk create gallery images to reduce DB hits
-            UploadImage.objects.bulk_create([
-                UploadImage(galary=profile, image=img) for img in images
-            ])
+            # Compress gallery photos in parallel, then bulk create them
+            _, rejected = ingest_gallery(profile, images)
+            if rejected:
+                names = ', '.join(upload.name for upload in rejected)
+                messages.warning(request, f"Could not use these photos: {names}. Please upload smaller JPEG or PNG images.")
+                return redirect('create_profile')
             return redirect('profiles_list')
     else:
         form = UserProfileForm(instance=user_profile)
@@ -140,74 +151,47 @@ def logout_view(request):
 
 
 @login_required
+@onboarding_required
 def profiles_list(request):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
-    min_age = request.GET.get('min_age')
-    max_age = request.GET.get('max_age')
-    caste = request.GET.get('caste')
-    country = request.GET.get('country')
-    state = request.GET.get('state')
-    city = request.GET.get('city')
-    # --- Check if user has sent interest today ---
-    today = now().date()
-    access_today = ProfileInterest.objects.filter(sender=request.user, created_at__date=today).count()
-    # --- Base queryset ---
-    profiles = UserProfile.objects.select_related('user').prefetch_related('gallery_image').filter(user__is_verified=True).exclude(user=request.user)
+    # --- Interests sent today (cached daily counter) ---
+    access_today = interests_sent_today(request.user.id)
     # --- Filter opposite gender ---
-    current_user_profile = UserProfile.objects.filter(user=request.user).first()
-    if current_user_profile and current_user_profile.gender in ['Male', 'Female']:
-        opposite_gender = 'Female' if current_user_profile.gender == 'Male' else 'Male'
-        profiles = profiles.filter(gender__iexact=opposite_gender)
-    # --- Filter by age, caste, country, state, city ---
-    if min_age or max_age:
-        today = date.today()
-        if min_age:
-            min_age = int(min_age)
-            dob_max = date(today.year - min_age, today.month, today.day)
-            profiles = profiles.filter(dob__lte=dob_max)  # born before or on dob_max
-        if max_age:
-            max_age = int(max_age)
-            dob_min = date(today.year - max_age, today.month, today.day)
-            profiles = profiles.filter(dob__gte=dob_min)  # born after or on dob_min
-    if caste:
-        profiles = profiles.filter(caste__icontains=caste)
-    if country:
-        profiles = profiles.filter(country__icontains=country)
-    if state:
-        profiles = profiles.filter(state__icontains=state)
-    if city:
-        profiles = profiles.filter(city__icontains=city)
-    # --- Dropdowns ---
-    dropdown_fields = ['country', 'state', 'city', 'caste']
-    dropdowns = {}
-    for field in dropdown_fields:
-        dropdowns[field + 's'] = (
-            UserProfile.objects
-            .exclude(**{f"{field}__isnull": True})
-            .exclude(**{f"{field}": ''})
-            .values_list(field, flat=True)
-            .distinct()
-            .order_by(field)
-        )
+    opposite_gender = None
+    gender = request.user_profile.gender
+    if gender in ['Male', 'Female']:
+        opposite_gender = 'Female' if gender == 'Male' else 'Male'
+    # --- Filter by age, caste, country, state, city (indexed search table) ---
+    filters = {
+        field: request.GET.get(field)
+        for field in ['min_age', 'max_age', 'caste', 'country', 'state', 'city']
+    }
+    hide_contacted = request.GET.get('hide_contacted') == '1'
+    entries = search_profiles(request.user, gender=opposite_gender, exclude_contacted=hide_contacted, **filters)
+    # --- Dropdowns (cached facet counts, scoped to the current filters) ---
+    dropdowns = get_dropdowns(gender=opposite_gender, **filters)
     # --- Pagination ---
-    paginator = Paginator(profiles, 2)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    # --- Sent interests ---
-    sent_interest_ids = ProfileInterest.objects.filter(sender=request.user).values_list('receiver_id', flat=True)
+    paginator = KeysetPaginator(entries, settings.PROFILES_PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    page_obj.object_list = load_profiles(page_obj.object_list)
+    # Premium badges for the whole page from one cache read
+    windows = premium_windows([profile.user_id for profile in page_obj.object_list])
+    for profile in page_obj.object_list:
+        profile.premium_until = windows.get(profile.user_id)
+    shortlisted_ids = set(
+        Shortlist.objects.filter(user=request.user, profile_id__in=[profile.id for profile in page_obj.object_list])
+        .values_list('profile_id', flat=True)
+    )
+    # --- Sent interests (cached sorted id array, bisect lookups) ---
+    sent_interest_ids = get_contacted(request.user.id)
     # --- Premium check ---
-    access_premium = PremiumUser.objects.filter(user=request.user, is_premium=True, expiry_date__gt=today).exists()
+    access_premium = is_premium(request.user.id)
     # --- Context ---
     context = {
         'profiles': page_obj,
         'sent_interest_ids': sent_interest_ids,
+        'shortlisted_ids': shortlisted_ids,
         'access_today': access_today,
+        'daily_interest_limit': settings.FREE_DAILY_INTERESTS,
         'access_premium': 1 if access_premium else 0,
         **dropdowns
     }
@@ -215,39 +199,73 @@ def profiles_list(request):
 
 
 @login_required
+@onboarding_required(require_gender=True)
 def send_interest(request, profile_id):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
     receiver_profile = get_object_or_404(UserProfile, id=profile_id)
-    check_profile = UserProfile.objects.filter(user=request.user).first()
-    if not check_profile or not check_profile.gender:
-        return redirect('create_profile')
-    ProfileInterest.objects.create(sender=request.user, receiver=receiver_profile)
-    sender_profile = get_object_or_404(UserProfile, user=request.user)
-    # Run email sending in background thread
-    threading.Thread(
-        target=send_interest_email,
-        args=(receiver_profile, request.user, sender_profile),
-        daemon=True  # ensures thread closes when request ends
-    ).start()
+    # Idempotent: a second click finds the interest already sent and changes nothing
+    result = send_interests(request.user, [receiver_profile.id])
+    if result.over_quota:
+        messages.warning(request, _quota_warning())
     return redirect(request.META.get('HTTP_REFERER', 'profiles_list'))
 
 
+def _quota_warning():
+    return f"You can send {settings.FREE_DAILY_INTERESTS} interests a day. Upgrade to premium for unlimited interests."
+
+
+@login_required
+@onboarding_required
+def matches_view(request):
+    return render(request, 'profile/matches.html', {'matches': my_matches(request.user)})
+
+
+@login_required
+@onboarding_required
+def shortlist_view(request):
+    entries = (
+        Shortlist.objects.filter(user=request.user)
+        .select_related('profile__user')
+    )
+    context = {
+        'entries': entries,
+        'sent_interest_ids': get_contacted(request.user.id),
+        'max_bulk_interests': MAX_BULK_INTERESTS,
+    }
+    return render(request, 'profile/shortlist.html', context)
+
+
+@login_required
+@onboarding_required
+def toggle_shortlist(request, profile_id):
+    if request.method == 'POST':
+        profile = get_object_or_404(UserProfile, id=profile_id)
+        deleted, _ = Shortlist.objects.filter(user=request.user, profile=profile).delete()
+        if not deleted and profile.user_id != request.user.id:
+            Shortlist.objects.get_or_create(user=request.user, profile=profile)
+    return redirect(request.META.get('HTTP_REFERER', 'shortlist'))
+
+
 @login_required
+@onboarding_required(require_gender=True)
+def send_interests_bulk(request):
+    """Send interests to the posted ``profile_ids`` (e.g. a shortlist) in one request."""
+    if request.method != 'POST':
+        return redirect('shortlist')
+    profile_ids = [int(pk) for pk in request.POST.getlist('profile_ids') if pk.isdigit()]
+    result = send_interests(request.user, profile_ids)
+    if request.headers.get('Accept') == 'application/json':
+        return JsonResponse(result._asdict())
+    if result.sent:
+        messages.success(request, f"Interest sent to {len(result.sent)} profiles.")
+    if result.over_quota:
+        messages.warning(request, _quota_warning())
+    return redirect(request.META.get('HTTP_REFERER', 'shortlist'))
+
+
+@login_required
+@onboarding_required
 def interest_list(request):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
-    my_profile = request.user.profile
+    my_profile = request.user_profile
     # Incoming: users who sent interest to me
     incoming_interests = ProfileInterest.objects.filter(receiver=my_profile)
     # Outgoing: interests I sent to others
@@ -261,36 +279,20 @@ def interest_list(request):
 
 
 @login_required
+@onboarding_required
 def accept_interest(request, interest_id):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
     interest = get_object_or_404(ProfileInterest, id=interest_id, receiver__user=request.user)
     interest.status = 'accepted'
     interest.save()
-    receiver_profile = get_object_or_404(UserProfile, user=request.user)
-    # Run email sending in background thread
-    threading.Thread(
-        target=send_interest_accept_email,
-        args=(receiver_profile, interest.sender.email, interest.sender.first_name),
-        daemon=True  # ensures thread closes when request ends
-    ).start()
+    receiver_profile = request.user_profile
+    # Queued; delivered by the email outbox worker
+    send_interest_accept_email(receiver_profile, interest.sender.email, interest.sender.first_name)
     return redirect(request.META.get('HTTP_REFERER', 'interest_list'))
 
 
 @login_required
+@onboarding_required
 def reject_interest(request, interest_id):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
     interest = get_object_or_404(ProfileInterest, id=interest_id, receiver__user=request.user)
     interest.status = 'rejected'
     interest.save()
@@ -339,160 +341,138 @@ def user_profile_detail(request, uid):
     }
     return render(request, 'profile/user_profile_detail.html', context)
 
-# Call your Abuse / Phone detection API
-            # try:
-            #     import requests
-            #     api_response = requests.post(
-            #         "http://127.0.0.1:8000/tools/get-text-check/",
-            #         json={"text": text},
-            #         timeout=5
-            #     )
-
-            #     result = api_response.json().get("data", {})
-            #     abuse = result.get("abuse_used", False)
-            #     mobile = result.get("mobile_number_used", False)
-
-            #     # If either abuse OR mobile found → block message
-            #     if abuse or mobile:
-            #         ChatMessage.objects.create(
-            #             sender=request.user,
-            #             receiver=receiver,
-            #             message=" "   # store blank
-            #         )
-            #         messages.warning(request, "It's your last warning!")
-            #     else:
-            #         # Safe message → save normally
-            #         ChatMessage.objects.create(
-            #             sender=request.user,
-            #             receiver=receiver,
-            #             message=text
-            #         )
-
-            # except Exception as e:
-            #     print("API error:", e)
-            #     # In API failure, still allow message to be saved
-            #     ChatMessage.objects.create(
-            #         sender=request.user,
-            #         receiver=receiver,
-            #         message=text
-            #     )
-
-
 @login_required
+@onboarding_required
 def chat_view(request, receiver_email):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
     # Find receiver by email
     receiver = get_object_or_404(User, username=receiver_email)
     profile = get_object_or_404(UserProfile, user=receiver)
-    # Get chat messages (both directions)
-    messages = ChatMessage.objects.filter(
-        sender__in=[request.user, receiver],
-        receiver__in=[request.user, receiver]
-    ).order_by('timestamp')
-    # Mark receiver’s unread messages as seen
-    ChatMessage.objects.filter(
-        sender=receiver, receiver=request.user, seen=False
-    ).update(seen=True)
-    # Handle new message
+    # Handle new message; the page script posts with fetch() and gets JSON back,
+    # the message itself reaches both participants through chat_events
     if request.method == "POST":
         text = request.POST.get('message')
+        msg = None
+        warning = None
         if text:
-            print(request.user, receiver, text)
-            ChatMessage.objects.create(sender=request.user, receiver=receiver, message=text)
+            # Abuse / phone numbers are blanked by the moderation pre_save hook
+            msg = ChatMessage.objects.create(sender=request.user, receiver=receiver, message=text)
+            if msg.moderation.abuse or msg.moderation.mobile:
+                warning = "It's your last warning!"
+        if request.headers.get('Accept') == 'application/json':
+            return JsonResponse({
+                'success': msg is not None,
+                'message': message_event(msg) if msg else None,
+                'warning': warning,
+            })
+        if warning:
+            messages.warning(request, warning)
         return redirect('chat_view', receiver_email=receiver.username)
+    # Newest window of the thread; older messages are fetched from chat_history
+    chat_messages, has_older = message_window(request.user, receiver, settings.CHAT_WINDOW_SIZE)
+    # Move my read watermark; the receiver's watermark drives the seen ticks
+    _mark_chat_read(request.user, receiver)
+    peer_last_read_id = read_watermark(receiver, request.user)
     return render(request, 'chat/chat.html', {
         'receiver': receiver,
-        'messages': messages,
+        'messages': chat_messages,
+        'has_older': has_older,
+        'peer_last_read_id': peer_last_read_id,
         'profile': profile,
     })
 
 
+@login_required
+@onboarding_required
+def chat_mark_read(request, receiver_email):
+    """Called by an open chat page when a new message arrives over chat_events."""
+    if request.method != "POST":
+        return JsonResponse({'success': False}, status=405)
+    receiver = get_object_or_404(User, username=receiver_email)
+    _mark_chat_read(request.user, receiver)
+    return JsonResponse({'success': True})
+
+
+def _mark_chat_read(user, peer):
+    last_read_id = mark_conversation_read(user, peer)
+    if last_read_id is not None:
+        publish_read(user, peer, last_read_id)
+
+
+@login_required
+@onboarding_required
+async def chat_events(request):
+    """
+    Server-Sent Events stream of new messages and read receipts for the current
+    user. Needs the ASGI application (demo_test.asgi) to hold connections open;
+    under WSGI each stream would pin a worker thread, so it answers 204, which
+    tells EventSource to stop reconnecting, and the chat page works without live updates.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+
+    async def stream():
+        yield "retry: 3000\n\n"
+        async for event in get_broker().subscribe(user.pk):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+    return response
+
+
+@login_required
+@onboarding_required
+def chat_history(request, receiver_email):
+    receiver = get_object_or_404(User, username=receiver_email)
+    before_id = request.GET.get('before', '')
+    if not before_id.isdigit():
+        return JsonResponse({'error': "'before' must be a message id."}, status=400)
+    before = get_object_or_404(thread(request.user, receiver), id=before_id)
+    messages, has_more = message_window(request.user, receiver, settings.CHAT_WINDOW_SIZE, before=before)
+    peer_last_read_id = read_watermark(receiver, request.user)
+    return JsonResponse({
+        'messages': [
+            {
+                'id': msg.id,
+                'message': msg.message,
+                'timestamp': msg.timestamp.isoformat(),
+                'sent': msg.sender_id == request.user.id,
+                'seen': msg.id <= peer_last_read_id,
+            }
+            for msg in messages
+        ],
+        'has_more': has_more,
+    })
+
+
 def navbar_notifications(request):
     if request.user.is_authenticated:
-        unseen_messages = (
-            ChatMessage.objects.filter(receiver=request.user, seen=False)
-            .values('sender__username')
-            .annotate(total=Count('id'))
-            .order_by('-total')
-        )
+        unseen_messages = unread_summary(request.user.pk)  # cached, no SQL on a warm cache
     else:
         unseen_messages = []
     return {'unseen_messages': unseen_messages}
 
 
 @login_required
+@onboarding_required
 def chat_home(request):
-    user_profile = UserProfile.objects.filter(user=request.user).first()
-    if not user_profile or not user_profile.identity_proof:
-        messages.warning(request, "You must complete your profile first.")
-        return redirect('create_profile')
-    if request.user.is_verified == False:
-        messages.warning(request, "Your profile is now under verification. Please wait for admin approval.")
-        return redirect('create_profile')
-    # Collect all chat partners of current user
-    chat_partners = ChatMessage.objects.filter(
-        Q(sender=request.user) | Q(receiver=request.user)
-    ).values_list('sender', 'receiver', named=True)
-    user_ids = set()
-    for c in chat_partners:
-        if c.sender != request.user.id:
-            user_ids.add(c.sender)
-        if c.receiver != request.user.id:
-            user_ids.add(c.receiver)
-    # Prepare unseen count per sender
-    unseen_counts = (
-        ChatMessage.objects.filter(receiver=request.user, seen=False)
-        .values('sender')
-        .annotate(total=Count('id'))
-    )
-    unseen_dict = {u['sender']: u['total'] for u in unseen_counts}
-    # Get user list and annotate with latest message time
-    users = (
-        User.objects.filter(id__in=user_ids)
-        .annotate(
-            last_message_time=Greatest(
-                Max('sent_messages__timestamp', filter=Q(sent_messages__receiver=request.user)),
-                Max('received_messages__timestamp', filter=Q(received_messages__sender=request.user))
-            )
-        )
-    )
-    # Add unread indicator manually
-    user_data = []
-    for u in users:
-        last_msg = (
-            ChatMessage.objects.filter(
-                Q(sender=request.user, receiver=u) | Q(sender=u, receiver=request.user)
-            )
-            .order_by('-timestamp')
-            .first()
-        )
-        unseen_count = unseen_dict.get(u.id, 0)
-        has_unread = unseen_count > 0
-        user_data.append({
-            'user': u,
-            'last_message': last_msg.message if last_msg else '',
-            'timestamp': last_msg.timestamp if last_msg else '',
-            'unseen_count': unseen_count,
-            'has_unread': has_unread,
-        })
-    # ✅ Sort unread first, then by timestamp (newest first)
-    user_data.sort(key=lambda x: (not x['has_unread'], x['timestamp'] or 0), reverse=False)
+    # One indexed range query over the user's conversation rows, keyset-paginated (no COUNT)
+    paginator = KeysetPaginator(inbox(request.user), settings.CHAT_INBOX_PAGE_SIZE, field='last_message_at')
+    user_data = paginator.get_page(request.GET.get('cursor'))
     return render(request, 'chat/chat_list.html', {'user_data': user_data})
 
 
 @login_required
 def premium_form_view(request):
     user = request.user
-     # Check if user already has a valid premium subscription
-    active_premium = PremiumUser.objects.filter(
-        user=user, is_premium=True, expiry_date__gt=now().date()
-    ).first()
+    # Check if user already has a valid premium subscription; the row is only fetched for premium users
+    until = premium_until(user.id)
+    active_premium = until and PremiumUser.objects.filter(user=user, is_premium=True, expiry_date=until).first()
     if active_premium:
         # Fetch all payment records for display
         all_payments = PremiumUser.objects.filter(user=user).order_by('-updated')
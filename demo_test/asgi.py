@@ -2,6 +2,8 @@
 ASGI config for demo_test project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the site through this entry point (e.g. ``uvicorn demo_test.asgi:application``)
+so the realtime chat event stream can hold connections open.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -74,6 +74,15 @@ DATABASES = {
     }
 }
 
+# Shared by every web and worker process: unread counters, interest quotas,
+# premium status and feed facets are only correct if all processes see the same cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,6 +125,30 @@ EMAIL_HOST_USER= os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD= os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Profiles shown per page in the discovery feed (keyset paginated)
+PROFILES_PAGE_SIZE = int(os.environ.get('PROFILES_PAGE_SIZE', 12))
+# Conversations shown per page in the chat inbox
+CHAT_INBOX_PAGE_SIZE = int(os.environ.get('CHAT_INBOX_PAGE_SIZE', 20))
+# Messages loaded per window when opening or scrolling back through a chat
+CHAT_WINDOW_SIZE = int(os.environ.get('CHAT_WINDOW_SIZE', 50))
+# Fan-out for realtime chat events; the in-process broker only reaches clients of this process
+CHAT_BROKER = os.environ.get('CHAT_BROKER', 'accounts.realtime.InProcessBroker')
+# Compress uploads inside the request. Set to False to hand them to run_image_processing instead;
+# uploads then show the placeholder until that worker is running and has processed them
+IMAGE_PROCESSING_SYNC = os.environ.get('IMAGE_PROCESSING_SYNC', 'True') == 'True'
+# Uploads are streamed to temp files and cut off past MAX_UPLOAD_SIZE (see accounts/uploads.py)
+FILE_UPLOAD_HANDLERS = ['accounts.uploads.BoundedUploadHandler']
+# Largest accepted photo or receipt upload, in bytes
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 1024 * 1024))
+# Interests a free user may send per IST day; premium users are unlimited
+FREE_DAILY_INTERESTS = int(os.environ.get('FREE_DAILY_INTERESTS', 3))
+# Processes compressing multi-photo gallery uploads in parallel
+GALLERY_UPLOAD_WORKERS = int(os.environ.get('GALLERY_UPLOAD_WORKERS', min(4, os.cpu_count() or 1)))
+# Abusive terms blocked in chat; edits are picked up without a restart
+CHAT_MODERATION_WORDLIST = os.environ.get(
+    'CHAT_MODERATION_WORDLIST', BASE_DIR / 'accounts' / 'data' / 'abusive_words.txt'
+)
+
 CSRF_TRUSTED_ORIGINS = [
     "https://be068ed3ae8e.ngrok-free.app",
 ]